@@ -0,0 +1,229 @@
+# Benchmark harness: times the ingest stages (scan, parse, load, rollups, merge, growth, ranking, snapshot) and the
+# dashboard reads (filters, chart queries q1 - q36 and their grouped plan) on SQLite, a DuckDB snapshot and/or PostgreSQL.
+# Every run is saved as JSON (benchmarks/<time>-<commit>.json) and can be compared with an older run.
+#   python benchmark.py                                  # synthetic tree, SQLite + DuckDB
+#   python benchmark.py --root pulse/data --backends sqlite postgres --db postgresql://...
+#   python benchmark.py --compare latest                 # flag stages slower than the last run
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+import data_access
+import filter_index
+import growth
+import ingest
+import loader
+import map_merge
+import pulse_synth
+import query_plan
+import query_service
+import ranking
+import rollups
+import snapshot
+from queries import PARAMS, QUERIES
+
+
+log = logging.getLogger(__name__)
+
+RESULTS_DIR = 'benchmarks'
+
+# Filter selections timed on the map frame: name -> function of the sidebar options
+SELECTIONS = {
+    'one_state': lambda o: {'state': o['state'][:1]},
+    'one_year': lambda o: {'year': o['year'][-1:]},
+    'state_year_quarter': lambda o: {'state': o['state'][:3], 'year': o['year'][-2:], 'quarter': [1]},
+    'one_district': lambda o: {'district': o['district'][:1]},
+}
+
+# A stage is reported as a regression when it got slower than this (ratio to the baseline)
+TOLERANCE = 1.2
+
+
+# Median wall time of `repeat` calls; returns (seconds, result of the last call)
+def timed(fn, repeat=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def _record(results, backend, stage, name, seconds, rows=None):
+    results.append({'backend': backend, 'stage': stage, 'name': name, 'seconds': round(seconds, 6), 'rows': rows})
+    log.info("%-8s %-8s %-32s %9.4fs", backend, stage, name, seconds)
+
+
+# Ingest into a database (SQLAlchemy engine), stage by stage
+def bench_ingest(results, backend, engine, root, workers=None):
+    seconds, files = timed(lambda: ingest.scan_files(root))
+    _record(results, backend, 'ingest', 'scan', seconds, len(files))
+    seconds, (frames, errors, _) = timed(lambda: ingest.parse_files(files, workers))
+    _record(results, backend, 'ingest', 'parse', seconds, sum(map(len, frames.values())))
+    seconds, _ = timed(functools.partial(loader.replace_tables, engine, frames))
+    _record(results, backend, 'ingest', 'load', seconds, sum(map(len, frames.values())))
+    del frames
+    seconds, _ = timed(lambda: rollups.refresh(engine))
+    _record(results, backend, 'ingest', 'rollups', seconds)
+    seconds, df = timed(lambda: map_merge.refresh(engine))
+    _record(results, backend, 'ingest', 'merge', seconds, None if df is None else len(df))
+    seconds, df = timed(lambda: growth.refresh(engine))
+    _record(results, backend, 'ingest', 'growth', seconds, None if df is None else len(df))
+    seconds, df = timed(lambda: ranking.refresh(engine))
+    _record(results, backend, 'ingest', 'ranking', seconds, None if df is None else len(df))
+    # End to end, as run in production (streamed datasets, manifest, data version)
+    seconds, _ = timed(lambda: ingest.refresh(engine, root, workers=workers, incremental=False))
+    _record(results, backend, 'ingest', 'refresh_full', seconds)
+    seconds, _ = timed(lambda: ingest.refresh(engine, root, workers=workers))
+    _record(results, backend, 'ingest', 'refresh_noop', seconds)
+
+
+# Selection with the index's result cache emptied first, so the lookup itself is measured
+def _select_uncached(index, filters):
+    index['cache'].clear()
+    return filter_index.select(index, filters)
+
+
+# Dashboard reads on an engine, a snapshot directory (source) and the matching chart connection
+def bench_dashboard(results, backend, source, chart_engine, repeat=3):
+    seconds, frame = timed(lambda: data_access.map_frame(source), repeat)
+    _record(results, backend, 'filter', 'map_frame', seconds, len(frame))
+    seconds, index = timed(lambda: filter_index.build_index(frame), repeat)
+    _record(results, backend, 'filter', 'build_index', seconds, len(frame))
+    options = filter_index.options(index)
+    for name, selection in SELECTIONS.items():
+        filters = selection(options)
+        seconds, df = timed(lambda: _select_uncached(index, filters), repeat)
+        _record(results, backend, 'filter', f'index_{name}', seconds, len(df))
+        seconds, df = timed(lambda: data_access.map_frame(source, filters), repeat)
+        _record(results, backend, 'filter', f'read_{name}', seconds, len(df))
+
+    for name, sql in QUERIES.items():
+        params = PARAMS.get(name, {})
+        seconds, df = timed(lambda: query_service.read(chart_engine, sql, params), repeat)
+        _record(results, backend, 'query', name, seconds, len(df))
+
+    # The same charts from one grouped query per rollup table (query_plan.py)
+    for table in query_plan.GROUPINGS:
+        sql = query_plan.grouping_sql(table, query_service._grouping_sets(chart_engine))
+        seconds, df = timed(lambda: query_service.read(chart_engine, sql), repeat)
+        _record(results, backend, 'plan', table, seconds, len(df))
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+# Run the benchmark; returns the run as a dict ({'run': {...}, 'results': [...]})
+def run(root=None, backends=('sqlite', 'duckdb'), db=None, repeat=3, workers=None, synth=None):
+    with tempfile.TemporaryDirectory(prefix='phonepe-bench-') as tmp:
+        if root is None:
+            root = os.path.join(tmp, 'pulse', 'data')
+            seconds, files = timed(lambda: pulse_synth.generate(root, **(synth or {})))
+            log.info("Synthetic tree: %d files in %.1fs", files, seconds)
+
+        results = []
+        engines = {}
+        if 'sqlite' in backends or 'duckdb' in backends:
+            engines['sqlite'] = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        if 'postgres' in backends:
+            engines['postgres'] = create_engine(db)
+
+        for backend, engine in engines.items():
+            bench_ingest(results, backend, engine, root, workers)
+            if backend in backends:
+                bench_dashboard(results, backend, engine, engine, repeat)
+
+        if 'duckdb' in backends:
+            # Parquet snapshot of the SQLite database; charts on duckdb views over it
+            seconds, path = timed(lambda: snapshot.write(engines['sqlite'], os.path.join(tmp, 'snapshot')))
+            _record(results, 'duckdb', 'ingest', 'snapshot', seconds)
+            bench_dashboard(results, 'duckdb', path, snapshot.connect(path), repeat)
+
+        for engine in engines.values():
+            engine.dispose()
+        query_service.invalidate()
+
+    return {'run': {'commit': _commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'root': None if synth else root,
+                    'synth': synth, 'backends': list(backends), 'repeat': repeat,
+                    'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine(),
+                    'cpus': os.cpu_count()},
+            'results': results}
+
+
+def save(report, out=RESULTS_DIR):
+    os.makedirs(out, exist_ok=True)
+    stamp = report['run']['time'].replace(':', '').replace('-', '')
+    path = os.path.join(out, f"{stamp}-{report['run']['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
+    return path
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Newest saved run in `out` other than `exclude`
+def latest(out=RESULTS_DIR, exclude=None):
+    paths = sorted(os.path.join(out, p) for p in os.listdir(out) if p.endswith('.json')) if os.path.isdir(out) else []
+    paths = [p for p in paths if p != exclude]
+    return paths[-1] if paths else None
+
+
+# Timings of the current run next to the baseline's (in the current run's order), ratio = current / baseline
+def compare(current, baseline, tolerance=TOLERANCE):
+    keys = ['backend', 'stage', 'name']
+    now = pd.DataFrame(current['results'])[keys + ['seconds']]
+    before = pd.DataFrame(baseline['results'])[keys + ['seconds']]
+    df = pd.merge(before, now, on=keys, how='right', suffixes=('_baseline', '_current'))
+    df['ratio'] = (df['seconds_current'] / df['seconds_baseline']).round(2)
+    df['regression'] = df['ratio'] > tolerance
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the PhonePe ingest and dashboard reads")
+    parser.add_argument('--root', help="Pulse data tree (default: a synthetic tree, see pulse_synth.py)")
+    parser.add_argument('--states', type=int, default=10, help="synthetic tree: states")
+    parser.add_argument('--districts', type=int, default=20, help="synthetic tree: districts per state")
+    parser.add_argument('--years', type=pulse_synth.year_range, default=range(2018, 2025),
+                        help="synthetic tree: years, e.g. 2018-2024")
+    parser.add_argument('--backends', nargs='+', choices=['sqlite', 'duckdb', 'postgres'], default=['sqlite', 'duckdb'])
+    parser.add_argument('--db', default=os.environ.get('PHONEPE_DB_URL'),
+                        help="PostgreSQL URL for the postgres backend - its PhonePe tables are replaced "
+                             "(default: $PHONEPE_DB_URL)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per read (the median is kept)")
+    parser.add_argument('--workers', type=int, help="parse processes (default: all cores)")
+    parser.add_argument('--out', default=RESULTS_DIR, help="folder the results are saved in")
+    parser.add_argument('--compare', help="results file to compare with, or 'latest'")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+    if 'postgres' in args.backends and not args.db:
+        parser.error("--db (or $PHONEPE_DB_URL) is required for the postgres backend")
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    synth = None if args.root else {'states': args.states, 'districts': args.districts, 'years': list(args.years)}
+    report = run(args.root, args.backends, args.db, args.repeat, args.workers, synth)
+    path = save(report, args.out)
+    print(f"Results saved to {path}")
+
+    baseline = latest(args.out, exclude=path) if args.compare == 'latest' else args.compare
+    if baseline:
+        table = compare(report, load(baseline), args.tolerance)
+        print(table.to_string(index=False))
+        slower = table[table['regression']]
+        print(f"\n{len(slower)} of {len(table)} timings slower than {args.tolerance}x {baseline}")
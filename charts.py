@@ -0,0 +1,112 @@
+# Business Case Study sections: each chart is (query name from queries.py, figure builder)
+from concurrent.futures import as_completed
+import plotly.express as px             # For interactive visualizations
+
+
+# "2023 - 2024" for a growth chart's title (the years it compares come with its data)
+def _years(df):
+    return f"{df['from_year'].iloc[0]} - {df['to_year'].iloc[0]}" if len(df) else ''
+
+
+SECTIONS = [
+    ('case_1', "**1. Decoding Transaction Dynamics on PhonePe**", [
+        ('q1', lambda df: px.bar(df, x='state', y='total_amount', title='1.Total Transaction Amount by State',
+                                 hover_data={'total_amount': ':.2f'}, text_auto=True)),
+        ('q2', lambda df: px.bar(df, x='state', y='percentage', color='percentage', title='2.States with Decline in Transaction Amount (YoY)',
+                                 hover_data={'year': ':.0f', 'present_year_totalamt': ':.2f', 'previous_year_totalamt': ':.2f', 'percentage': ':.2f'}, text_auto=True)),
+        ('q3', lambda df: px.pie(df, names='type_payments', values='total_amount', title='3.Transactions by Payment Type',
+                                 hover_data=['total_count'], hole=0.3)),
+        ('q4', lambda df: px.bar(df, x='state', y='avg_amount', title='4.Average Transaction Amount by State',
+                                 hover_data={'avg_amount': ':.2f'}, text_auto=True)),
+        ('q5', lambda df: px.line(df, x='quarter', y='total_amount', color='year', markers=True, title='5.National Transaction Trend by Quarter',
+                                  hover_data={'total_amount': ':.2f'})),
+    ]),
+    ('case_2', "**2. Device Dominance and User Engagement Analysis**", [
+        ('q6', lambda df: px.bar(df, x='brand', y='total_users', title='6.Total Registered Users by Device Brand',
+                                 hover_data={'total_users': ':.0f'}, text_auto=True)),
+        ('q7', lambda df: px.pie(df, names='state', values='opens', title='7.Top 5 States by App Opens',
+                                 hover_data=['opens'], hole=0.3)),
+        ('q8', lambda df: px.bar(df, x='brand', y='open_to_user_ratio', color='brand',
+                                 title='8.App Opens to User Ratio by Brand', hover_data=['open_to_user_ratio'], text_auto=True)),
+        ('q9', lambda df: px.bar(df, x='state', y='growth_percentage', title=f'9.User Growth Percentage {_years(df)}',
+                                 hover_data=['users_from', 'users_to', 'growth_percentage'], text_auto=True)),
+    ]),
+    ('case_3', "**3. Insurance Penetration and Growth Potential Analysis**", [
+        ('q10', lambda df: px.bar(df, x='rank', y='total_ins_amt', color='state',
+                                  title='10.Rank wise Insurance Txn', text_auto=True)),
+        ('q11', lambda df: px.line(df, x='year', y='total_amount', markers=True,
+                                   title='11.Yearly Insurance Growth Trend', hover_data=['total_amount'], text='total_amount')),
+        ('q12', lambda df: px.pie(df, names='state', values='total_amount', title='12.Insurance Market Share by State', hole=0.2,
+                                  hover_data=['total_amount'])),
+        ('q13', lambda df: px.bar(df, x='state', y='total_policies', title='13.Top 5 States by Insurance Policy Count',
+                                  hover_data=['total_policies'], text_auto=True)),
+    ]),
+    ('case_4', "**4. Transaction Analysis for Market Expansion**", [
+        ('q14', lambda df: px.bar(df, x='state', y='avg_amount', title='14.Avg Transaction Amount by State(Bottom 5)',
+                                  hover_data=['avg_amount'], text_auto=True)),
+        ('q15', lambda df: px.line(df, x='quarter', y='total_amount', color='year', markers=True,
+                                   title='15.Transaction Trend Over Time', hover_data=['total_amount'], text='total_amount')),
+        ('q16', lambda df: px.bar(df, x='district', y='total_amount', title='16.Top 10 Districts by Transaction Amount',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q17', lambda df: px.bar(df, x='state', y='avg_amount', title='17.Average Transaction Amount per State',
+                                  hover_data=['avg_amount'], text_auto=True)),
+        ('q18', lambda df: px.line(df, x='year', y='total_txns', markers=True,
+                                   title='18.Transaction Count Yearly Trend', hover_data=['total_txns'], text='total_txns')),
+    ]),
+    ('case_5', "**5. User Engagement and Growth Strategy**", [
+        ('q19', lambda df: px.bar(df, x='state', y='total_users', title='19.Registered Users by State',
+                                  hover_data=['total_users'], text_auto=True)),
+        ('q20', lambda df: px.bar(df, x='district', y='total_users', title='20.Top 10 Districts by Registered Users',
+                                  hover_data=['total_users'], text_auto=True)),
+        ('q21', lambda df: px.line(df, x='quarter', y='users', color='year', markers=True,
+                                   title='21.Quarterly Registered Users Over Time', hover_data=['users'], text='users')),
+        ('q22', lambda df: px.bar(df, x='state', y='growth_percentage', color='growth_percentage', title=f'22.User Growth Percentage {_years(df)}',
+                                  hover_data=['users_from', 'users_to', 'growth_percentage'], text_auto=True)),
+        ('q23', lambda df: px.bar(df, x='district', y='total_users', color='district',
+                                  title='23.Top Districts per Year by User Registrations', hover_data=['total_users'], text_auto=True)),
+    ]),
+    ('case_6', "**6. Insurance Engagement Analysis**", [
+        ('q24', lambda df: px.bar(df, x='state', y='total_amount', title='24.Insurance Amount by State',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q25', lambda df: px.bar(df, x='district', y='total_amount', title='25.Top 10 Districts by Insurance Amount',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q26', lambda df: px.pie(df, values='total_amount', names='pincode', title='26.Top 10 Pincodes by Insurance Amount',
+                                  hover_data=['total_amount'])),
+        ('q27', lambda df: px.line(df, x='quarter', y='total_amount', color='year', markers=True,
+                                   title='27.Insurance Transactions Over Time', hover_data=['total_amount'], text='total_amount')),
+        ('q28', lambda df: px.bar(df, x='district', y='total_amount', color='year',
+                                  title='28.Top Districts by Insurance per Year', hover_data=['total_amount'], text_auto=True)),
+    ]),
+    ('case_7', "**7.Transaction Analysis Across States and Districts**", [
+        ('q29', lambda df: px.bar(df, x='quarter', y='total_amount', title='29.Total Transactions by Quarter Wise',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q30', lambda df: px.bar(df, x='district', y='total_amount', title='30.Top 10 Districts by Transaction Amount',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q31', lambda df: px.pie(df, names='pincode', values='total_amount', title='31.Top 10 Pincodes by Transaction Amount',
+                                  hover_data=['total_amount'])),
+        ('q32', lambda df: px.bar(df, x='year', y='total_amount', title='32.Yearly Transaction Amount (Nationwide)',
+                                  hover_data=['total_amount'], text_auto=True)),
+        ('q33', lambda df: px.bar(df, x='district', y='total', color='year', title='33.Top Districts by Yearly Transactions',
+                                  hover_data=['total'], text_auto=True)),
+    ]),
+    ('case_8', "**8. User Registration Analysis**", [
+        ('q34', lambda df: px.pie(df, names='pincode', values='total_users', title='34.Top 10 Pincodes by User Registrations',
+                                  hover_data=['total_users'])),
+        ('q35', lambda df: px.line(df, x='quarter', y='users', color='year', markers=True,
+                                   title='35.Quarterly User Registration Trends', hover_data=['users'], text='users')),
+        ('q36', lambda df: px.bar(df, x='year', y='users', color='year', title='36.User Growth by Year',
+                                  hover_data=['users'], text_auto=True)),
+    ]),
+]
+
+
+# Start one section's queries on a thread pool: {future: (query name, figure builder)}
+def submit_section(charts, run_query, executor):
+    return {executor.submit(run_query, name): (name, build) for name, build in charts}
+
+
+# (query name, figure) for submitted queries, in the order they finish
+def completed(futures):
+    for future in as_completed(futures):
+        name, build = futures[future]
+        yield name, build(future.result())
@@ -0,0 +1,94 @@
+# Dashboard data access: column-pruned reads with the sidebar filters pushed into SQL WHERE clauses.
+# Every reader takes a SQLAlchemy engine or a snapshot directory (snapshot.current()); snapshots are
+# read memory-mapped with the same filters applied as partition / row predicates.
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+import map_merge
+import perf
+import snapshot
+
+
+# Sidebar filter columns, in the order they are applied
+FILTERS = ['state', 'district', 'year', 'quarter']
+
+# Columns of each table that filters may apply to
+TABLE_COLUMNS = {
+    'aggregated_transaction': ['state', 'year', 'quarter'],
+    'aggregated_user': ['state', 'year', 'quarter'],
+    'aggregated_insurance': ['state', 'year', 'quarter'],
+    'map_transaction': FILTERS,
+    'map_insurance': FILTERS,
+    'map_user': FILTERS,
+    'map_country_insurance': FILTERS,
+    'top_transaction': FILTERS,
+    'top_user': FILTERS,
+    'top_insurance': FILTERS,
+    'map_merge': FILTERS,
+}
+
+
+def _is_snapshot(source):
+    return isinstance(source, str)
+
+
+# WHERE clause for {column: [values] or None}. None skips the column (no filter),
+# an empty list matches nothing (everything deselected in the sidebar).
+# Returns (sql, params, expanding bind parameters).
+def where_clause(filters, columns, extra=()):
+    clauses, params, binds = list(extra), {}, []
+    for col, values in (filters or {}).items():
+        if values is None or col not in columns:
+            continue
+        if len(values) == 0:
+            clauses.append('1 = 0')
+            continue
+        clauses.append(f"{col} IN :{col}")
+        params[col] = [v.item() if hasattr(v, 'item') else v for v in values]
+        binds.append(bindparam(col, expanding=True))
+    sql = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return sql, params, binds
+
+
+def read(engine, table, columns, filters=None, extra=(), suffix=''):
+    where, params, binds = where_clause(filters, TABLE_COLUMNS.get(table, FILTERS), extra)
+    sql = text(f"SELECT {', '.join(columns)} FROM {table}{where}{suffix}").bindparams(*binds)
+    start = perf.clock()
+    df = pd.read_sql(sql, engine, params=params)
+    perf.record('read_sql', table, start, df)
+    return df
+
+
+# Distinct sidebar options (no fact rows are loaded)
+def filter_options(engine):
+    if _is_snapshot(engine):
+        keys = snapshot.read(engine, snapshot.MAP_FRAME, columns=FILTERS)
+        return {col: sorted(keys[col].unique().tolist()) for col in FILTERS}
+    if inspect(engine).has_table(map_merge.MAP_MERGE):
+        places = read(engine, map_merge.MAP_MERGE, ['DISTINCT state', 'district'])
+        periods = read(engine, map_merge.MAP_MERGE, ['DISTINCT year', 'quarter'])
+    else:
+        # Not re-ingested yet: states & districts with coordinates, periods of map_transaction
+        places = read(engine, map_merge.COORDS_TABLE, ['DISTINCT state', 'district'],
+                      extra=[f"year >= {map_merge.COORDS_FROM_YEAR}", 'latitude IS NOT NULL'])
+        periods = read(engine, 'map_transaction', ['DISTINCT year', 'quarter'])
+    return {
+        'state': sorted(places['state'].unique().tolist()),
+        'district': sorted(places['district'].unique().tolist()),
+        'year': sorted(periods['year'].unique().tolist()),
+        'quarter': sorted(periods['quarter'].unique().tolist()),
+    }
+
+
+# Merged map frame (map_merge: users + transactions + insurance + coordinates) for the selected filters
+def map_frame(engine, filters=None):
+    if _is_snapshot(engine):
+        return snapshot.read(engine, snapshot.MAP_FRAME, filters=filters)
+    if inspect(engine).has_table(map_merge.MAP_MERGE):
+        return read(engine, map_merge.MAP_MERGE, map_merge.COLUMNS, filters)
+
+    # Database without map_merge (not re-ingested yet): merge the filtered map tables here
+    keys = ['state', 'district', 'year', 'quarter']
+    tables = {table: read(engine, table, keys + measures, filters) for table, measures in map_merge.MAP_TABLES.items()}
+    tables[map_merge.COORDS_TABLE] = read(engine, map_merge.COORDS_TABLE, keys[:3] + ['latitude', 'longitude'], filters,
+                                          extra=[f"year >= {map_merge.COORDS_FROM_YEAR}"])
+    return map_merge.build(tables)
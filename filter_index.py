@@ -0,0 +1,110 @@
+# In-memory filter index for the sidebar multiselects.
+# Key columns are stored compactly (state/district as categoricals, year/quarter as small ints) and
+# every key value maps to the sorted row positions holding it. A selection is answered from the
+# positions of its most selective filter, narrowed by code lookups for the others; filters that
+# select every value are skipped, and results are cached per selection.
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+KEY_COLUMNS = ['state', 'district', 'year', 'quarter', 'pincode']
+
+# Compact dtypes for the key columns
+KEY_DTYPES = {'state': 'category', 'district': 'category', 'year': 'int16', 'quarter': 'int16', 'pincode': 'int32'}
+
+# Filtered frames kept per index (LRU)
+SELECTION_CACHE_SIZE = 64
+
+
+def _compact(df):
+    df = df.copy()
+    for col, dtype in KEY_DTYPES.items():
+        if col not in df:
+            continue
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(dtype)
+    return df.reset_index(drop=True)
+
+
+# Build the index for a frame: {'frame', 'columns': {col: {'values', 'codes', 'positions'}}, cache}
+def build_index(df, columns=KEY_COLUMNS):
+    df = _compact(df)
+    index = {'frame': df, 'columns': {}, 'cache': OrderedDict(), 'lock': threading.Lock()}
+    for col in columns:
+        if col not in df:
+            continue
+        codes, values = pd.factorize(df[col], sort=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        index['columns'][col] = {
+            'values': np.asarray(values),
+            'codes': codes.astype(np.int32),
+            'positions': [order[bounds[i]:bounds[i + 1]] for i in range(len(values))],
+        }
+    return index
+
+
+# Sidebar options: the distinct values of each key column, sorted
+def options(index):
+    return {col: info['values'].tolist() for col, info in index['columns'].items()}
+
+
+# Codes selected by one filter, or None when it selects every value (no-op).
+# Values are sorted, so a binary search finds each code without hashing.
+def _selected_codes(info, values):
+    known = info['values']
+    wanted = np.asarray(list(values), dtype=known.dtype)
+    codes = np.searchsorted(known, wanted).clip(0, max(len(known) - 1, 0))
+    codes = np.unique(codes[known[codes] == wanted]) if len(known) else codes[:0]
+    return None if len(codes) == len(known) else codes
+
+
+# Hashable key of a selection (cache key)
+def selection_key(filters):
+    return tuple(sorted((col, tuple(sorted(values))) for col, values in filters.items()
+                        if values is not None))
+
+
+# Rows matching every filter ({column: [values] or None}); unknown columns are ignored.
+# The returned frame may be shared between callers and must not be modified in place.
+def select(index, filters):
+    key = selection_key(filters or {})
+    with index['lock']:
+        if key in index['cache']:
+            index['cache'].move_to_end(key)
+            return index['cache'][key]
+
+    active = []
+    for col, values in (filters or {}).items():
+        info = index['columns'].get(col)
+        if info is None or values is None:
+            continue
+        codes = _selected_codes(info, values)
+        if codes is not None:
+            size = sum(len(info['positions'][c]) for c in codes)
+            active.append((size, col, codes))
+
+    if not active:
+        result = index['frame']
+    else:
+        # Start from the most selective filter's row positions, narrow with the others
+        active.sort(key=lambda item: item[0])
+        _, col, codes = active[0]
+        positions = index['columns'][col]['positions']
+        rows = np.concatenate([positions[c] for c in codes]) if len(codes) else np.empty(0, np.int64)
+        for _, col, codes in active[1:]:
+            info = index['columns'][col]
+            keep = np.zeros(len(info['values']), dtype=bool)
+            keep[codes] = True
+            rows = rows[keep[info['codes'][rows]]]
+        result = index['frame'].take(np.sort(rows))          # Keep the frame's row order
+
+    with index['lock']:
+        index['cache'][key] = result
+        while len(index['cache']) > SELECTION_CACHE_SIZE:
+            index['cache'].popitem(last=False)
+    return result
@@ -0,0 +1,191 @@
+# Growth table (growth): value, year-over-year / quarter-over-quarter change, percent growth and
+# CAGR of every metric at state, district and pincode grain, built once per ingest.
+# One row per (metric, grain, key, year, quarter); quarter = 0 is the whole year (YoY and CAGR),
+# quarters 1 - 4 carry the change on the previous quarter (QoQ). Charts read any pair of years
+# with an indexed lookup on (metric, grain, year, quarter) instead of aggregating the fact tables,
+# and years added by a later ingest are picked up without changing a query.
+import logging
+import pandas as pd
+from sqlalchemy import inspect, text
+import loader
+import perf
+
+
+log = logging.getLogger(__name__)
+
+GROWTH = 'growth'
+
+# Grain -> columns identifying one series
+GRAINS = {'state': ['state'], 'district': ['state', 'district'], 'pincode': ['state', 'pincode']}
+
+# Grain -> source table -> {metric: SQL aggregate per (key, year, quarter)}
+SOURCES = {
+    'state': {
+        'aggregated_transaction': {'transaction_count': 'SUM(transaction_count)',
+                                   'transaction_amount': 'SUM(transaction_amount)'},
+        # Every device brand row repeats the state's totals for the quarter
+        'aggregated_user': {'registered_users': 'MAX(registeredusers)', 'app_opens': 'MAX(appopens)'},
+        'aggregated_insurance': {'insurance_count': 'SUM(count)', 'insurance_amount': 'SUM(amount)'},
+    },
+    'district': {
+        'map_transaction': {'transaction_count': 'SUM(transaction_count)',
+                            'transaction_amount': 'SUM(transaction_amount)'},
+        'map_user': {'registered_users': 'SUM(registered_users)', 'app_opens': 'SUM(app_opens)'},
+        'map_insurance': {'insurance_count': 'SUM(insurance_count)', 'insurance_amount': 'SUM(insurance_amount)'},
+    },
+    'pincode': {
+        'top_transaction': {'transaction_count': 'SUM(count)', 'transaction_amount': 'SUM(amount)'},
+        'top_user': {'registered_users': 'SUM(registeredusers)'},
+        'top_insurance': {'insurance_count': 'SUM(count)', 'insurance_amount': 'SUM(amount)'},
+    },
+}
+
+# Rows of the top_* tables with pincode 0 are districts
+PINCODE_ROWS = 'pincode > 0'
+
+COLUMNS = ['metric', 'grain', 'state', 'district', 'pincode', 'year', 'quarter',
+           'value', 'previous', 'delta', 'pct', 'cagr']
+
+
+# SELECT of one source table's metrics per (key, year, quarter), optionally for some states only
+def source_sql(grain, table, states=None):
+    keys = GRAINS[grain]
+    where = [PINCODE_ROWS] if grain == 'pincode' else []
+    if states is not None:
+        where.append(f"state IN ({', '.join(':s%d' % i for i in range(len(states)))})")
+    metrics = [f"{expr} AS {metric}" for metric, expr in SOURCES[grain][table].items()]
+    return (f"SELECT {', '.join(keys)}, year, quarter, {', '.join(metrics)} FROM {table} "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY {', '.join(keys)}, year, quarter")
+
+
+# Change on the previous period of each series; period = year (yearly rows) or year * 4 + quarter
+def _changes(df, keys, period):
+    df = df.sort_values(keys + [period], kind='stable')
+    grouped = df.groupby(keys, sort=False, dropna=False)
+    follows = grouped[period].diff() == 1
+    df['previous'] = grouped['value'].shift().where(follows)
+    df['delta'] = df['value'] - df['previous']
+    df['pct'] = df['delta'] / df['previous'].replace(0, float('nan')) * 100
+    return df
+
+
+# Growth rows of one grain from the per-quarter values (long: keys, year, quarter, metric, value)
+def build(grain, values):
+    keys = ['metric'] + GRAINS[grain]
+    values = values.dropna(subset=['year', 'quarter']).copy()
+    values['year'] = values['year'].astype('int64')
+    values['quarter'] = values['quarter'].astype('int64')
+    values['value'] = pd.to_numeric(values['value'], errors='coerce')
+
+    quarterly = values.assign(period=values['year'] * 4 + values['quarter'])
+    quarterly = _changes(quarterly, keys, 'period').drop(columns='period')
+    quarterly['cagr'] = float('nan')
+
+    yearly = values.groupby(keys + ['year'], dropna=False)['value'].sum(min_count=1).reset_index()
+    yearly['quarter'] = 0
+    yearly = _changes(yearly, keys, 'year')
+    # Compound annual growth since the series' first year with a positive value
+    base = yearly[yearly['value'] > 0].groupby(keys, dropna=False)[['year', 'value']].first().reset_index()
+    base = yearly[keys].merge(base, on=keys, how='left')
+    span = (yearly['year'] - base['year'].to_numpy()).where(lambda s: s > 0)
+    ratio = (yearly['value'] / base['value'].to_numpy()).where(lambda s: s > 0)
+    yearly['cagr'] = ((ratio ** (1 / span) - 1) * 100).where(span.notna())
+
+    df = pd.concat([yearly, quarterly], ignore_index=True)
+    df['grain'] = grain
+    for col in COLUMNS:
+        if col not in df:
+            df[col] = None
+    return df[COLUMNS]
+
+
+# Per-quarter values of every metric of a grain, as long rows; states: only these states
+def _read(con, grain, existing, states=None):
+    params = {f's{i}': s for i, s in enumerate(states or [])}
+    frames = []
+    for table in SOURCES[grain]:
+        if table not in existing:
+            continue
+        df = pd.read_sql(text(source_sql(grain, table, states)), con, params=params)
+        frames.append(df.melt(id_vars=GRAINS[grain] + ['year', 'quarter'], var_name='metric', value_name='value'))
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def _sources(grain, tables):
+    return [table for table in SOURCES[grain] if table in tables]
+
+
+# Rebuild the growth table after an ingest.
+# sources: fact tables that changed (default: all).
+# partitions: optional {fact table: {(state, year, quarter), ...}} from an incremental ingest -
+#   the series of the affected states are recomputed (a new quarter changes later YoY / CAGR).
+def refresh(engine, sources=None, partitions=None):
+    start = perf.clock()
+    existing = set(inspect(engine).get_table_names())
+    every = {table for tables in SOURCES.values() for table in tables}
+    sources = set(partitions or sources or every) & every
+    if not sources:
+        return None
+
+    if partitions is None or GROWTH not in existing:
+        frames = [build(grain, values) for grain in SOURCES
+                  for values in [_read(engine, grain, existing)] if values is not None]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+        loader.replace_table(engine, GROWTH, df)
+        perf.record('growth', GROWTH, start, df)
+        log.info("Rebuilt %s: %d rows", GROWTH, len(df))
+        return df
+
+    frames = []
+    with engine.begin() as conn:
+        for grain in SOURCES:
+            for table in _sources(grain, sources):
+                states = sorted({s for s, y, q in partitions[table]})
+                metrics = list(SOURCES[grain][table])
+                values = _read(conn, grain, {table}, states)
+                conn.execute(text(f"DELETE FROM {GROWTH} WHERE grain = :grain AND metric = :metric AND state = :state"),
+                             [{'grain': grain, 'metric': m, 'state': s} for m in metrics for s in states])
+                if values is not None:
+                    df = build(grain, values)
+                    loader.copy_rows(conn, GROWTH, df)
+                    frames.append(df)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    perf.record('growth', GROWTH, start, df)
+    log.info("Updated %s: %d rows", GROWTH, len(df))
+    return df
+
+
+# Years of a metric at a grain, oldest first
+def years(engine, metric, grain='state'):
+    sql = (f"SELECT DISTINCT year FROM {GROWTH} WHERE metric = :metric AND grain = :grain AND quarter = 0 "
+           "ORDER BY year")
+    return [int(y) for y in pd.read_sql(text(sql), engine, params={'metric': metric, 'grain': grain})['year']]
+
+
+# Change between any two years, one row per series: value_from, value_to, delta, pct and cagr (% a year).
+# Default: the last two years of the metric. Reads at most two yearly rows per series.
+def compare(engine, metric, grain='state', from_year=None, to_year=None):
+    if to_year is None or from_year is None:
+        available = years(engine, metric, grain)
+        to_year = available[-1] if to_year is None and available else to_year
+        from_year = to_year - 1 if from_year is None and to_year is not None else from_year
+    keys = GRAINS[grain]
+    sql = (f"SELECT {', '.join(keys)}, year, value FROM {GROWTH} WHERE metric = :metric AND grain = :grain "
+           "AND quarter = 0 AND year IN (:from_year, :to_year)")
+    df = pd.read_sql(text(sql), engine, params={'metric': metric, 'grain': grain,
+                                                'from_year': from_year, 'to_year': to_year})
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    pair = df.pivot_table(index=keys, columns='year', values='value', aggfunc='sum')
+    result = pd.DataFrame({'value_from': pair.get(from_year, pd.Series(0.0, index=pair.index)).fillna(0),
+                           'value_to': pair.get(to_year, pd.Series(0.0, index=pair.index)).fillna(0)})
+    result['delta'] = result['value_to'] - result['value_from']
+    result['pct'] = result['delta'] / result['value_from'].replace(0, float('nan')) * 100
+    ratio = (result['value_to'] / result['value_from'].replace(0, float('nan'))).where(lambda s: s > 0)
+    result['cagr'] = (ratio ** (1 / (to_year - from_year)) - 1) * 100 if to_year != from_year else float('nan')
+    result = result.reset_index()
+    result.insert(len(keys), 'from_year', from_year)
+    result.insert(len(keys) + 1, 'to_year', to_year)
+    return result
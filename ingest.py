@@ -0,0 +1,457 @@
+# PhonePe Pulse Ingestion Engine
+import hashlib                                       # Content hash for the ingest manifest
+import json                                          # To read .json files
+import logging                                       # Structured warnings instead of print()
+import os                                            # To walk the pulse/data tree
+from concurrent.futures import ProcessPoolExecutor   # To parse files on every core
+import pandas as pd                                  # For the final DataFrames
+from sqlalchemy import inspect, text                 # For partition upserts
+import growth                                        # YoY / QoQ / CAGR table
+import loader                                        # COPY-based bulk loader
+import manifest                                      # Source file manifest for incremental runs
+import map_merge                                     # Merged, geocoded district table
+import ranking                                       # Top-K leaderboards
+import rollups                                       # Dashboard rollup tables
+import snapshot                                      # Parquet snapshot for the dashboard
+
+
+log = logging.getLogger(__name__)
+
+# Root of the cloned PhonePe Pulse repository (git clone https://github.com/PhonePe/pulse.git)
+PULSE_ROOT = os.path.join('pulse', 'data')
+
+# Partition columns every dataset gets from its file location
+PARTITION = ['state', 'year', 'quarter']
+
+# Datasets marked 'batched' are never held in memory whole: parsed files are cut into batches
+# of BATCH_ROWS rows with compact dtypes and loaded one batch at a time
+BATCH_ROWS = 50_000
+COMPACT_DTYPES = {'state': 'category', 'district': 'category', 'year': 'int16', 'quarter': 'int16',
+                  'pincode': 'int32', 'latitude': 'float32', 'longitude': 'float32'}
+
+# Files handed to the process pool at a time (bounds the parsed results waiting to be consumed)
+PARSE_CHUNK_FILES = 2048
+
+
+# Extractors
+# Each one receives the loaded JSON of a single <quarter>.json file and returns
+# a dict of column lists (columnar, one list per column) for that file.
+
+def extract_map_transaction(data):
+    rows = data['data']['hoverDataList'] or []
+    return {'district': [i['name'] for i in rows],
+            'transaction_count': [i['metric'][0]['count'] for i in rows],
+            'transaction_amount': [i['metric'][0]['amount'] for i in rows]}
+
+
+def extract_map_insurance(data):
+    rows = data['data']['hoverDataList'] or []
+    return {'district': [i['name'] for i in rows],
+            'insurance_count': [i['metric'][0]['count'] for i in rows],
+            'insurance_amount': [i['metric'][0]['amount'] for i in rows]}
+
+
+def extract_map_country_insurance(data):
+    # Each point is [latitude, longitude, metric, district]
+    rows = data['data']['data']['data'] or []
+    return {'district': [i[3] for i in rows],
+            'metric': [i[2] for i in rows],
+            'latitude': [i[0] for i in rows],
+            'longitude': [i[1] for i in rows]}
+
+
+def extract_map_user(data):
+    rows = data['data']['hoverData'] or {}
+    return {'district': list(rows),
+            'registered_users': [i['registeredUsers'] for i in rows.values()],
+            'app_opens': [i['appOpens'] for i in rows.values()]}
+
+
+def extract_aggregated_transaction(data):
+    rows = data['data']['transactionData'] or []
+    return {'type_payments': [i['name'] for i in rows],
+            'transaction_count': [i['paymentInstruments'][0]['count'] for i in rows],
+            'transaction_amount': [i['paymentInstruments'][0]['amount'] for i in rows]}
+
+
+def extract_aggregated_user(data):
+    reg_users = data['data']['aggregated']['registeredUsers']
+    app_opens = data['data']['aggregated']['appOpens']
+    devices = data['data'].get('usersByDevice') or []
+    if not devices:
+        # If no device info, still record base data with brand as None
+        return {'registeredusers': [reg_users], 'appopens': [app_opens],
+                'brand': [None], 'count': [None], 'percentage': [None]}
+    n = len(devices)
+    return {'registeredusers': [reg_users] * n,
+            'appopens': [app_opens] * n,
+            'brand': [i.get('brand', 'Unknown') for i in devices],
+            'count': [i.get('count', 0) for i in devices],
+            'percentage': [i.get('percentage', 0) for i in devices]}
+
+
+def extract_aggregated_insurance(data):
+    rows = data['data']['transactionData'] or []
+    return {'type': [i['name'] for i in rows],
+            'count': [i['paymentInstruments'][0]['count'] for i in rows],
+            'amount': [i['paymentInstruments'][0]['amount'] for i in rows]}
+
+
+def _extract_top_metric(data):
+    # Shared by top transaction & top insurance: district rows first, then pincode rows
+    districts = data['data']['districts'] or []
+    pincodes = data['data']['pincodes'] or []
+    rows = districts + pincodes
+    return {'district': [i['entityName'] for i in districts] + [None] * len(pincodes),
+            'type': ['district'] * len(districts) + ['pincode'] * len(pincodes),
+            'count': [i['metric']['count'] for i in rows],
+            'amount': [i['metric']['amount'] for i in rows],
+            'pincode': [0] * len(districts) + [int(i['entityName']) for i in pincodes]}
+
+
+def extract_top_user(data):
+    districts = data['data']['districts'] or []
+    pincodes = data['data']['pincodes'] or []
+    return {'district': [i['name'] for i in districts] + [None] * len(pincodes),
+            'type': ['district'] * len(districts) + ['pincode'] * len(pincodes),
+            'registeredusers': [i['registeredUsers'] for i in districts + pincodes],
+            'pincode': [0] * len(districts) + [int(i['name']) for i in pincodes]}
+
+
+# Declarative dataset specs: source folder (relative to PULSE_ROOT), output columns & extractor.
+# Keys are the table names the dashboard reads.
+DATASETS = {
+    'map_transaction': {
+        'path': 'map/transaction/hover/country/india/state',
+        'columns': ['state', 'district', 'year', 'quarter', 'transaction_count', 'transaction_amount'],
+        'extract': extract_map_transaction},
+    'map_insurance': {
+        'path': 'map/insurance/hover/country/india/state',
+        'columns': ['state', 'district', 'year', 'quarter', 'insurance_count', 'insurance_amount'],
+        'extract': extract_map_insurance},
+    'map_country_insurance': {
+        'path': 'map/insurance/country/india/state',
+        'columns': ['state', 'district', 'year', 'quarter', 'metric', 'latitude', 'longitude'],
+        'extract': extract_map_country_insurance,
+        'batched': True},
+    'map_user': {
+        'path': 'map/user/hover/country/india/state',
+        'columns': ['state', 'district', 'year', 'quarter', 'registered_users', 'app_opens'],
+        'extract': extract_map_user},
+    'aggregated_transaction': {
+        'path': 'aggregated/transaction/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'type_payments', 'transaction_count', 'transaction_amount'],
+        'extract': extract_aggregated_transaction},
+    'aggregated_user': {
+        'path': 'aggregated/user/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'registeredusers', 'appopens', 'brand', 'count', 'percentage'],
+        'extract': extract_aggregated_user},
+    'aggregated_insurance': {
+        'path': 'aggregated/insurance/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'type', 'count', 'amount'],
+        'extract': extract_aggregated_insurance},
+    'top_transaction': {
+        'path': 'top/transaction/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'district', 'type', 'count', 'amount', 'pincode'],
+        'extract': _extract_top_metric,
+        'batched': True},
+    'top_user': {
+        'path': 'top/user/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'district', 'type', 'registeredusers', 'pincode'],
+        'extract': extract_top_user,
+        'batched': True},
+    'top_insurance': {
+        'path': 'top/insurance/country/india/state',
+        'columns': ['state', 'year', 'quarter', 'district', 'type', 'count', 'amount', 'pincode'],
+        'extract': _extract_top_metric,
+        'batched': True},
+}
+
+
+# Walk the tree once per dataset with os.scandir: <state>/<year>/<quarter>.json
+# Returns a list of (dataset, state, year, quarter, path) tuples.
+def scan_files(root=PULSE_ROOT, datasets=None):
+    files = []
+    for name in datasets or DATASETS:
+        base = os.path.join(root, *DATASETS[name]['path'].split('/'))
+        if not os.path.isdir(base):
+            log.warning("Dataset folder not found: %s", base)
+            continue
+        with os.scandir(base) as states:
+            for state in states:
+                if not state.is_dir():
+                    continue
+                with os.scandir(state.path) as years:
+                    for year in years:
+                        if not (year.is_dir() and year.name.isdigit()):
+                            continue
+                        with os.scandir(year.path) as quarters:
+                            for qtr in quarters:
+                                stem = qtr.name[:-5]
+                                if qtr.name.endswith('.json') and stem.isdigit() and qtr.is_file():
+                                    files.append((name, state.name, int(year.name), int(stem), qtr.path))
+    files.sort()
+    return files
+
+
+# Parse one file in a worker process.
+# Returns (dataset, state, year, quarter, columns, sha256, error) - error is None on success.
+def parse_file(task):
+    name, state, year, quarter, path = task
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        return name, state, year, quarter, DATASETS[name]['extract'](json.loads(raw)), digest, None
+    except (OSError, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        return name, state, year, quarter, None, None, f"{path}: {type(e).__name__}: {e}"
+
+
+# Append one parsed file's columns to a dataset's column lists; returns the number of rows added
+def _extend(data, state, year, quarter, values):
+    n = len(values['district'] if 'district' in values else next(iter(values.values())))
+    if n == 0:
+        return 0
+    data['state'].extend([state] * n)
+    data['year'].extend([year] * n)
+    data['quarter'].extend([quarter] * n)
+    for col, vals in values.items():
+        data[col].extend(vals)
+    return n
+
+
+# Concatenate the per-file column lists of one dataset into a single DataFrame
+def assemble(name, parsed):
+    columns = DATASETS[name]['columns']
+    data = {c: [] for c in columns}
+    for state, year, quarter, values in parsed:
+        _extend(data, state, year, quarter, values)
+    return pd.DataFrame(data, columns=columns)
+
+
+def _compact(data, columns):
+    df = pd.DataFrame(data, columns=columns)
+    for col, dtype in COMPACT_DTYPES.items():
+        if col in df:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+# Cut the parsed files of one dataset into DataFrames of exactly `size` rows (the last one may be
+# shorter) with compact dtypes. Only one batch worth of column lists is held at a time.
+def iter_batches(name, parsed, size=BATCH_ROWS):
+    columns = DATASETS[name]['columns']
+    data, n = {c: [] for c in columns}, 0
+    for state, year, quarter, values in parsed:
+        n += _extend(data, state, year, quarter, values)
+        if n < size:
+            continue
+        df = _compact(data, columns)
+        full = n - n % size
+        for start in range(0, full, size):
+            yield df.iloc[start:start + size].reset_index(drop=True)
+        data = {c: df[c].iloc[full:].tolist() for c in columns}
+        n -= full
+    if n:
+        yield _compact(data, columns)
+
+
+# Parse scanned files across a process pool, PARSE_CHUNK_FILES at a time.
+# Yields (dataset, state, year, quarter, values) for every file that parsed and whose content hash
+# is not in `known`; error messages and {path: sha256} are collected into `errors` and `digests`.
+def iter_parsed(files, workers=None, known=None, errors=None, digests=None):
+    workers = workers or os.cpu_count() or 1
+    known = known or {}
+    errors = [] if errors is None else errors
+    digests = {} if digests is None else digests
+    pool = None if workers == 1 or len(files) < 64 else ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        for start in range(0, len(files), PARSE_CHUNK_FILES):
+            chunk = files[start:start + PARSE_CHUNK_FILES]
+            if pool is None:
+                results = map(parse_file, chunk)
+            else:
+                results = pool.map(parse_file, chunk, chunksize=max(1, len(chunk) // (workers * 8)))
+            for task, (name, state, year, quarter, values, digest, error) in zip(chunk, results):
+                if error:
+                    log.warning("Skipping file %s", error)
+                    errors.append(error)
+                    continue
+                digests[task[4]] = digest
+                if known.get(task[4]) != digest:
+                    yield name, state, year, quarter, values
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+# Parse a list of scanned files and assemble one DataFrame per dataset.
+# known: optional {path: sha256} - files whose content hash is unchanged are dropped.
+# Returns ({dataset: DataFrame}, [error messages], {path: sha256} of parsed files).
+def parse_files(files, workers=None, known=None):
+    parsed = {name: [] for name in dict.fromkeys(f[0] for f in files)}
+    errors, digests = [], {}
+    for name, state, year, quarter, values in iter_parsed(files, workers, known, errors, digests):
+        parsed[name].append((state, year, quarter, values))
+    return {name: assemble(name, rows) for name, rows in parsed.items()}, errors, digests
+
+
+# Batches of one 'batched' dataset, parsed as they are consumed (see iter_batches)
+def stream_dataset(name, files, workers=None, known=None, errors=None, digests=None):
+    files = [f for f in files if f[0] == name]
+    parsed = ((state, year, quarter, values)
+              for _, state, year, quarter, values in iter_parsed(files, workers, known, errors, digests))
+    return iter_batches(name, parsed)
+
+
+# Full ingest: scan + parse every dataset (or a subset) under root
+def ingest(root=PULSE_ROOT, datasets=None, workers=None):
+    frames, errors, _ = parse_files(scan_files(root, datasets), workers)
+    for name in datasets or DATASETS:
+        frames.setdefault(name, pd.DataFrame(columns=DATASETS[name]['columns']))
+    return frames, errors
+
+
+# Store every DataFrame to SQL: bulk-loaded into a staging table and swapped in atomically
+def write_tables(frames, engine):
+    loader.replace_tables(engine, frames)
+
+
+def delete_partitions(conn, name, partitions):
+    if partitions and inspect(conn).has_table(name):
+        conn.execute(text(f"DELETE FROM {name} WHERE state = :state AND year = :year AND quarter = :quarter"),
+                     [{'state': s, 'year': y, 'quarter': q} for s, y, q in partitions])
+
+
+# Replace only the (state, year, quarter) partitions present in `partitions` for one table.
+# Runs as one short transaction so readers keep seeing the old rows until commit.
+def upsert_partitions(conn, name, df, partitions):
+    delete_partitions(conn, name, partitions)
+    loader.copy_rows(conn, name, df)
+
+
+# Upsert a stream of batches: each partition is cleared the first time a batch holds it.
+# Returns the partitions seen, so changed partitions that are now empty can be cleared after.
+def upsert_batches(conn, name, batches):
+    seen = set()
+    for batch in batches:
+        keys = zip(batch['state'].astype(str), batch['year'].astype(int), batch['quarter'].astype(int))
+        new = sorted(set(keys) - seen)
+        delete_partitions(conn, name, new)
+        seen.update(new)
+        loader.copy_rows(conn, name, batch)
+    return seen
+
+
+# Rebuild map_merge when one of its source tables changed.
+# partitions: {table: {(state, year, quarter), ...}} from an incremental ingest - only those cells are
+# replaced (a coordinates change still rebuilds the whole table).
+def refresh_map_merge(engine, sources=None, partitions=None):
+    if not set(partitions or sources or ()) & (set(map_merge.MAP_TABLES) | {map_merge.COORDS_TABLE}):
+        return None
+    if partitions is None or map_merge.COORDS_TABLE in partitions:
+        return map_merge.refresh(engine)
+    return map_merge.refresh(engine, set().union(*(partitions.get(name, set()) for name in map_merge.MAP_TABLES)))
+
+
+# Derived tables rebuilt after a load: name -> (refresh(engine, sources=, partitions=), fact tables read)
+DERIVED = {
+    'rollups': (rollups.refresh, {source for source, _, _ in rollups.ROLLUPS.values()}),
+    'map_merge': (refresh_map_merge, set(map_merge.MAP_TABLES) | {map_merge.COORDS_TABLE}),
+    'growth': (growth.refresh, {table for tables in growth.SOURCES.values() for table in tables}),
+    'ranking': (ranking.refresh, set(ranking.SOURCES)),
+}
+
+
+def _count_rows(batches, counts):
+    for batch in batches:
+        counts['rows'] += len(batch)
+        yield batch
+
+
+# Extract, transform and load one dataset from the changed files of a scan.
+# known: {path: sha256} from the manifest - files with an unchanged hash are skipped.
+# incremental=False replaces the table; otherwise only the partitions whose content changed are upserted.
+# Returns {'files', 'parsed', 'rows', 'errors', 'digests', 'partitions', 'frame'}; frame is None for
+# 'batched' datasets (loaded batch by batch) and for datasets without changed files.
+def load_dataset(engine, name, changed, known=None, workers=None, incremental=True):
+    files = [f for f in changed if f[0] == name]
+    result = {'files': len(files), 'parsed': 0, 'rows': 0, 'errors': [], 'digests': {}, 'partitions': set(),
+              'frame': None}
+    if not files:
+        return result
+    known = known or {}
+    errors, digests = result['errors'], result['digests']
+
+    seen = None
+    if DATASETS[name].get('batched'):
+        batches = _count_rows(stream_dataset(name, files, workers, known, errors, digests), result)
+        if incremental:
+            with engine.begin() as conn:
+                seen = upsert_batches(conn, name, batches)
+        else:
+            loader.replace_table(engine, name, batches)
+    else:
+        parsed = [(state, year, quarter, values)
+                  for _, state, year, quarter, values in iter_parsed(files, workers, known, errors, digests)]
+        result['frame'] = assemble(name, parsed)
+        result['rows'] = len(result['frame'])
+        if not incremental:
+            loader.replace_table(engine, name, result['frame'])
+
+    # Partitions whose content actually changed (stat-only changes just refresh the manifest)
+    result['partitions'] = {(state, year, quarter) for _, state, year, quarter, path in files
+                            if path in digests and known.get(path) != digests[path]}
+    result['parsed'] = len(digests)
+    if incremental and result['partitions']:
+        with engine.begin() as conn:
+            if seen is not None:
+                delete_partitions(conn, name, sorted(result['partitions'] - seen))
+            else:
+                upsert_partitions(conn, name, result['frame'], sorted(result['partitions']))
+    return result
+
+
+# Write a new Parquet snapshot when the database holds a newer data version than the current one
+def write_snapshot(engine, snapshot_root=snapshot.SNAPSHOT_ROOT):
+    path = snapshot.current(snapshot_root)
+    if path is None or snapshot.version(path) != manifest.read_version(engine):
+        snapshot.write(engine, snapshot_root)
+
+
+# Refresh the database from the Pulse tree.
+# incremental=True parses only files that are new or changed since the last run (per the
+# manifest) and upserts just their partitions; otherwise every table is rebuilt.
+# snapshot_root: also write the dashboard's Parquet snapshot there (see snapshot.py).
+# Returns (frames, errors); 'batched' datasets are loaded batch by batch and are not in frames.
+def refresh(engine, root=PULSE_ROOT, datasets=None, workers=None, incremental=True, snapshot_root=None):
+    files = scan_files(root, datasets)
+    known_manifest = manifest.read_manifest(engine) if incremental else {}
+    changed, stats, known = manifest.stat_changed(files, root, known_manifest)
+
+    frames, errors, digests, touched = {}, [], {}, {}
+    for name in dict.fromkeys(f[0] for f in changed):
+        result = load_dataset(engine, name, changed, known, workers, incremental)
+        if result['frame'] is not None:
+            frames[name] = result['frame']
+        errors.extend(result['errors'])
+        digests.update(result['digests'])
+        if result['partitions']:
+            touched[name] = result['partitions']
+
+    loaded = list(dict.fromkeys(f[0] for f in changed))
+    for refresh_table, _ in DERIVED.values():
+        if not incremental:
+            refresh_table(engine, sources=loaded)
+        elif touched:
+            refresh_table(engine, partitions=touched)
+    with engine.begin() as conn:
+        manifest.write_manifest(conn, manifest.manifest_rows(changed, root, stats, digests))
+        if touched or not incremental:
+            manifest.bump_version(conn)
+    if snapshot_root:
+        write_snapshot(engine, snapshot_root)
+
+    log.info("Refreshed %d partitions from %d changed files", sum(map(len, touched.values())), len(changed))
+    return frames, errors
@@ -0,0 +1,102 @@
+# KPI aggregate store for the Overview cards.
+# Measures are pre-summed once per (state, district, year, quarter) cell; the KPIs of a sidebar
+# selection are sums over the selected cells (found through a filter index), cached per selection.
+# After an incremental ingest only the cells of the changed partitions are replaced.
+import itertools
+import threading
+from collections import OrderedDict
+import pandas as pd
+import data_access
+import filter_index
+import manifest
+import map_merge
+
+
+CELL_KEYS = ['state', 'district', 'year', 'quarter']
+
+MEASURES = ['registered_users', 'app_opens', 'transaction_count', 'transaction_amount',
+            'insurance_count', 'insurance_amount']
+
+# KPI dicts kept per store (LRU)
+KPI_CACHE_SIZE = 128
+
+_load_lock = threading.Lock()
+
+
+# One row per cell with its summed measures
+def cells(df):
+    if df.empty:
+        return pd.DataFrame(columns=CELL_KEYS + MEASURES)
+    summed = df.groupby(CELL_KEYS, observed=True, as_index=False)[MEASURES].sum()
+    summed[MEASURES] = summed[MEASURES].astype('float64')
+    return summed
+
+
+# Build the store from the merged map frame (map_merge rows)
+def build(df):
+    return {'index': filter_index.build_index(cells(df), CELL_KEYS), 'cache': OrderedDict(),
+            'lock': threading.Lock()}
+
+
+# New store with the cells of the given (state, year, quarter) partitions replaced by those summed
+# from `df` (the map_merge rows of those partitions); every other cell is kept as is
+def update(store, df, partitions):
+    current = store['index']['frame']
+    keys = pd.MultiIndex.from_arrays([current['state'].astype(str), current['year'].astype(int),
+                                      current['quarter'].astype(int)])
+    stale = keys.isin([(s, int(y), int(q)) for s, y, q in partitions])
+    current = current[~stale].astype({'state': str, 'district': str})
+    frame = pd.concat([current, cells(df)], ignore_index=True)
+    return {'index': filter_index.build_index(frame, CELL_KEYS), 'cache': OrderedDict(),
+            'lock': threading.Lock()}
+
+
+# Bring a store built at data version `since` up to date with the database: only the partitions
+# of map tables ingested since then are re-read. None when a full build is needed.
+def refresh(store, engine, since):
+    changed = manifest.changed_partitions(engine, since)
+    if changed is None or any(dataset == map_merge.COORDS_TABLE for dataset, *_ in changed):
+        return None
+    partitions = {(s, y, q) for dataset, s, y, q in changed if dataset in map_merge.MAP_TABLES}
+    if not partitions:
+        return store
+    # map_frame filters are per column, so the rows read cover every combination of the values
+    filters = {'state': sorted({p[0] for p in partitions}), 'year': sorted({p[1] for p in partitions}),
+               'quarter': sorted({p[2] for p in partitions})}
+    return update(store, data_access.map_frame(engine, filters), itertools.product(*filters.values()))
+
+
+# Store for data `version`, kept in `held` (a dict shared across reruns) between versions.
+# With a database engine, moving to a newer version only replaces the changed cells;
+# otherwise (first load, snapshots, coordinate changes) it is built from `frame`.
+def load(held, version, frame, engine=None):
+    with _load_lock:
+        store = held.get('store')
+        if store is not None and held['version'] != version:
+            store = refresh(store, engine, held['version']) if engine is not None else None
+        if store is None:
+            store = build(frame)
+        held.update(store=store, version=version)
+        return store
+
+
+# KPIs of a selection ({column: [values] or None}): summed measures plus the number of states,
+# districts and quarters with data
+def kpis(store, filters=None):
+    key = filter_index.selection_key(filters or {})
+    with store['lock']:
+        if key in store['cache']:
+            store['cache'].move_to_end(key)
+            return store['cache'][key]
+
+    selected = filter_index.select(store['index'], filters)
+    result = {m: float(selected[m].sum()) for m in MEASURES}
+    result['states'] = int(selected['state'].nunique())
+    result['districts'] = int(selected['district'].nunique())
+    result['quarters'] = int(selected['quarter'].nunique())
+
+    with store['lock']:
+        store['cache'][key] = result
+        while len(store['cache']) > KPI_CACHE_SIZE:
+            store['cache'].popitem(last=False)
+    return result
@@ -0,0 +1,154 @@
+# Bulk loader: COPY FROM STDIN for PostgreSQL, with a SQLite / DuckDB fallback
+import io
+import pandas as pd
+from sqlalchemy import inspect, text
+import schema
+
+
+# Rows per COPY / INSERT batch
+CHUNK_ROWS = 100_000
+
+
+def _is_duckdb(con):
+    # Native duckdb connection (duckdb.connect()), not a SQLAlchemy engine
+    return type(con).__module__.lstrip('_').startswith('duckdb')
+
+
+def _is_postgres(con):
+    return getattr(con, 'dialect', None) is not None and con.dialect.name == 'postgresql'
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Stream a DataFrame into an existing PostgreSQL table via COPY ... FROM STDIN (CSV)
+def _copy_postgres(cursor, table, df):
+    cols = ', '.join(_quote(c) for c in df.columns)
+    sql = f"COPY {_quote(table)} ({cols}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), CHUNK_ROWS):
+        buf = io.StringIO()
+        df.iloc[start:start + CHUNK_ROWS].to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cursor.copy_expert(sql, buf)
+
+
+# Create `table` if it does not exist yet: typed DDL for known tables, else the DataFrame's columns.
+# A schema table created in place (the first upsert into an empty database) also gets its indexes;
+# staging tables get them from replace_table / _swap.
+def _create_like(conn, table, df, name=None):
+    if inspect(conn).has_table(table):
+        return
+    if (name or table) in schema.TABLES:
+        schema.create_table(conn, name or table, table)
+        if table == (name or table):
+            schema.create_indexes(conn, table)
+    else:
+        df.head(0).to_sql(table, conn, index=False)
+
+
+# Append rows to a table inside the caller's transaction.
+# conn is a SQLAlchemy Connection (PostgreSQL uses COPY, others use batched INSERTs)
+# or a native duckdb connection. name: schema table the rows belong to (defaults to table).
+def copy_rows(conn, table, df, name=None):
+    df = schema.coerce(name or table, df)
+    if _is_duckdb(conn):
+        # Categoricals would register as ENUMs fixed to the first batch's values
+        df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+        conn.register('_load_frame', df)
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} AS SELECT * FROM _load_frame LIMIT 0")
+            conn.execute(f"INSERT INTO {_quote(table)} SELECT * FROM _load_frame")
+        finally:
+            conn.unregister('_load_frame')
+        return
+
+    _create_like(conn, table, df, name)
+    if df.empty:
+        return
+    if _is_postgres(conn):
+        _copy_postgres(conn.connection.cursor(), table, df)
+    else:
+        df.to_sql(table, conn, if_exists='append', index=False, chunksize=CHUNK_ROWS)
+
+
+# Swap <table>__staging in place of <table>
+def _swap(engine, table):
+    staging = f"{table}__staging"
+    old = f"{table}__old"
+    typed = table in schema.TABLES
+
+    if _is_duckdb(engine):
+        engine.execute("BEGIN TRANSACTION")
+        engine.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        engine.execute(f"ALTER TABLE {_quote(staging)} RENAME TO {_quote(table)}")
+        engine.execute("COMMIT")
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_quote(old)}"))
+        if inspect(conn).has_table(table):
+            conn.execute(text(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(old)}"))
+        conn.execute(text(f"ALTER TABLE {_quote(staging)} RENAME TO {_quote(table)}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {_quote(old)}"))
+        if typed and _is_postgres(engine):
+            for ix_name, _, _ in schema.indexes(table):
+                conn.execute(text(f"ALTER INDEX {_quote(ix_name + '__staging')} RENAME TO {_quote(ix_name)}"))
+            conn.execute(text(f"ANALYZE {_quote(table)}"))
+        elif typed:
+            schema.create_indexes(conn, table)
+
+
+# Copy a DataFrame or an iterable of DataFrame batches; an empty stream still creates the table
+def _copy_frames(conn, table, frames, name):
+    frames = [frames] if isinstance(frames, pd.DataFrame) else frames
+    copied = False
+    for df in frames:
+        copy_rows(conn, table, df, name)
+        copied = True
+    if not copied:
+        columns = [c.name for c in schema.TABLES[name].c] if name in schema.TABLES else []
+        copy_rows(conn, table, pd.DataFrame(columns=columns), name)
+
+
+# Load a DataFrame (or an iterable of DataFrame batches, loaded one at a time) into
+# <table>__staging, then swap it in atomically.
+# The old table stays readable until the swap commits - no window where it is missing.
+def replace_table(engine, table, df):
+    staging = f"{table}__staging"
+
+    if _is_duckdb(engine):
+        engine.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+        _copy_frames(engine, staging, df, table)
+        _swap(engine, table)
+        return
+
+    # 1. Fill the staging table (readers are not blocked while this runs).
+    #    On PostgreSQL the indexes are built here too, under temporary names.
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_quote(staging)}"))
+        _copy_frames(conn, staging, df, table)
+        if table in schema.TABLES and _is_postgres(engine):
+            schema.create_indexes(conn, table, staging, suffix='__staging')
+
+    # 2. Swap in one short transaction
+    _swap(engine, table)
+
+
+# Rebuild a derived table from a SELECT inside the database (CREATE TABLE AS + swap)
+def replace_table_query(engine, table, sql):
+    staging = f"{table}__staging"
+    if _is_duckdb(engine):
+        engine.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+        engine.execute(f"CREATE TABLE {_quote(staging)} AS {sql}")
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_quote(staging)}"))
+            conn.execute(text(f"CREATE TABLE {_quote(staging)} AS {sql}"))
+    _swap(engine, table)
+
+
+# Replace several tables (one staging swap per table)
+def replace_tables(engine, frames):
+    for table, df in frames.items():
+        replace_table(engine, table, df)
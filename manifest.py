@@ -0,0 +1,106 @@
+# Ingest manifest: one row per source JSON file (path, size, mtime, content hash)
+import os
+import time
+import pandas as pd
+from sqlalchemy import inspect, text
+
+
+MANIFEST_TABLE = 'ingest_manifest'
+
+MANIFEST_COLUMNS = ['path', 'dataset', 'state', 'year', 'quarter', 'size', 'mtime', 'sha256', 'ingested_at']
+
+
+# Path stored in the manifest: relative to the Pulse root, always with forward slashes
+def relative_path(path, root):
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+# Load the manifest as {relative path: row dict}; empty on the first run
+def read_manifest(engine):
+    if not inspect(engine).has_table(MANIFEST_TABLE):
+        return {}
+    df = pd.read_sql(f"SELECT * FROM {MANIFEST_TABLE}", engine)
+    return {row['path']: row for row in df.to_dict('records')}
+
+
+# Compare scanned files with the manifest using size & mtime only (no file reads).
+# Returns (files to parse, {path: (size, mtime)} for those files, known digests for them).
+def stat_changed(files, root, manifest):
+    changed, stats, known = [], {}, {}
+    for f in files:
+        path = f[4]
+        st = os.stat(path)
+        rel = relative_path(path, root)
+        old = manifest.get(rel)
+        stats[path] = (st.st_size, st.st_mtime)
+        if old is not None and old['size'] == st.st_size and old['mtime'] == st.st_mtime:
+            continue
+        changed.append(f)
+        if old is not None:
+            known[path] = old['sha256']
+    return changed, stats, known
+
+
+# Build manifest rows for parsed files
+def manifest_rows(files, root, stats, digests):
+    now = time.time()
+    rows = []
+    for name, state, year, quarter, path in files:
+        if path not in digests:
+            continue                  # Malformed files are retried on the next run
+        size, mtime = stats.get(path) or (os.stat(path).st_size, os.stat(path).st_mtime)
+        rows.append({'path': relative_path(path, root), 'dataset': name, 'state': state,
+                     'year': year, 'quarter': quarter, 'size': size, 'mtime': mtime,
+                     'sha256': digests[path], 'ingested_at': now})
+    return pd.DataFrame(rows, columns=MANIFEST_COLUMNS)
+
+
+# Upsert manifest rows (delete + insert by path) inside the caller's transaction
+def write_manifest(conn, rows):
+    if rows.empty:
+        return
+    if inspect(conn).has_table(MANIFEST_TABLE):
+        conn.execute(text(f"DELETE FROM {MANIFEST_TABLE} WHERE path = :path"),
+                     [{'path': p} for p in rows['path']])
+    rows.to_sql(MANIFEST_TABLE, conn, if_exists='append', index=False)
+
+
+# Data version: bumped after every ingest that changed rows, read by the dashboard's query cache
+VERSION_TABLE = 'data_version'
+
+
+def bump_version(conn):
+    if not inspect(conn).has_table(VERSION_TABLE):
+        conn.execute(text(f"CREATE TABLE {VERSION_TABLE} (version INTEGER, ingested_at FLOAT)"))
+    conn.execute(text(f"INSERT INTO {VERSION_TABLE} SELECT COALESCE(MAX(version), 0) + 1, :now FROM {VERSION_TABLE}"),
+                 {'now': time.time()})
+
+
+def read_version(engine):
+    if type(engine).__module__.lstrip('_').startswith('duckdb'):
+        # Native duckdb connection (e.g. snapshot.connect()); one cursor per calling thread
+        cur = engine.cursor()
+        if not cur.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?",
+                           [VERSION_TABLE]).fetchone()[0]:
+            return 0
+        return cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {VERSION_TABLE}").fetchone()[0]
+    if not inspect(engine).has_table(VERSION_TABLE):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM {VERSION_TABLE}")).scalar()
+
+
+# (dataset, state, year, quarter) partitions whose files were ingested after data version `since`,
+# or None when that cannot be told (no manifest or version history, or an unknown version)
+def changed_partitions(engine, since):
+    existing = set(inspect(engine).get_table_names())
+    if not {MANIFEST_TABLE, VERSION_TABLE} <= existing:
+        return None
+    with engine.connect() as conn:
+        since_at = conn.execute(text(f"SELECT MAX(ingested_at) FROM {VERSION_TABLE} WHERE version = :v"),
+                                {'v': since}).scalar()
+        if since_at is None:
+            return None
+        rows = conn.execute(text(f"SELECT DISTINCT dataset, state, year, quarter FROM {MANIFEST_TABLE} "
+                                 "WHERE ingested_at > :since"), {'since': since_at}).fetchall()
+    return {(d, s, int(y), int(q)) for d, s, y, q in rows}
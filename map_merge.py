@@ -0,0 +1,118 @@
+# Merged district fact table (map_merge): users + transactions + insurance + coordinates,
+# one typed row per (state, district, year, quarter). Built once per ingest; the dashboard reads it directly.
+import logging
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+import loader
+import perf
+
+
+log = logging.getLogger(__name__)
+
+MAP_MERGE = 'map_merge'
+
+# Source map tables: table -> measures it contributes (merge order = column order)
+MAP_TABLES = {
+    'map_user': ['registered_users', 'app_opens'],
+    'map_transaction': ['transaction_count', 'transaction_amount'],
+    'map_insurance': ['insurance_count', 'insurance_amount'],
+}
+
+# District coordinates come from map_country_insurance (recent years only)
+COORDS_TABLE = 'map_country_insurance'
+COORDS_FROM_YEAR = 2021
+
+COLUMNS = ['state', 'district', 'latitude', 'longitude', 'year', 'quarter'] + \
+          [m for measures in MAP_TABLES.values() for m in measures]
+
+# Rows without these are not plotted
+REQUIRED = ['latitude', 'longitude', 'transaction_count', 'app_opens', 'registered_users', 'transaction_amount']
+
+
+# Join key for district names: 'North Goa District', 'north goa district' and 'North  Goa' all
+# become 'north goa'. '&' is spelled 'and', punctuation is dropped.
+def district_key(names):
+    key = names.astype('string').str.lower().str.replace('&', ' and ', regex=False)
+    key = key.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    return key.str.replace(r'\s+district$', '', regex=True)
+
+
+def _keyed(df):
+    df = df.copy()
+    df['state'] = df['state'].astype('string').str.strip()
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int16')
+    if 'quarter' in df:
+        df['quarter'] = pd.to_numeric(df['quarter'], errors='coerce').astype('Int16')
+    df['district_key'] = district_key(df['district'])
+    return df.dropna(subset=['district_key'])
+
+
+# Build the merged frame from the three map tables and the coordinates table (DataFrames).
+# District names are matched on district_key(); the name shown is the first table's spelling.
+def build(tables):
+    start = perf.clock()
+    keys = ['state', 'year', 'quarter', 'district_key']
+    merged = None
+    for name, measures in MAP_TABLES.items():
+        grouped = _keyed(tables[name]).groupby(keys)
+        frame = grouped[measures].sum(min_count=1).join(grouped['district'].first()).reset_index()
+        if merged is None:
+            merged = frame
+            continue
+        merged = pd.merge(merged, frame, on=keys, how='outer', suffixes=('', '_other'))
+        merged['district'] = merged['district'].fillna(merged.pop('district_other'))
+
+    coords = _keyed(tables[COORDS_TABLE])
+    coords = coords[coords['year'] >= COORDS_FROM_YEAR].dropna(subset=['latitude', 'longitude'])
+    coords = coords.groupby(['state', 'district_key'])[['latitude', 'longitude']].first().reset_index()
+
+    df = pd.merge(merged, coords, on=['state', 'district_key'], how='left')
+    missing = df.loc[df['latitude'].isna(), ['state', 'district']].drop_duplicates()
+    if len(missing):
+        log.warning("%d districts have no coordinates and are left off the map: %s", len(missing),
+                    ', '.join(f"{s}/{d}" for s, d in missing.head(10).itertuples(index=False)))
+
+    for col in COLUMNS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(subset=REQUIRED)
+    df = df[COLUMNS].sort_values(['state', 'district', 'year', 'quarter']).reset_index(drop=True)
+    perf.record('merge', MAP_MERGE, start, df)
+    return df
+
+
+def _read_partitions(engine, table, partitions):
+    sql = text(f"SELECT * FROM {table} WHERE state IN :states AND year IN :years").bindparams(
+        bindparam('states', expanding=True), bindparam('years', expanding=True))
+    params = {'states': sorted({s for s, y, q in partitions}), 'years': sorted({int(y) for s, y, q in partitions})}
+    df = pd.read_sql(sql, engine, params=params)
+    keys = pd.MultiIndex.from_arrays([df['state'], pd.to_numeric(df['year']), pd.to_numeric(df['quarter'])])
+    return df[keys.isin(list(partitions))]
+
+
+# Read the source tables and rebuild map_merge (staging table + atomic swap).
+# partitions: optional {(state, year, quarter), ...} changed by an incremental ingest - only those
+# cells are rebuilt and replaced in place (coordinates are still looked up from the whole table).
+def refresh(engine, partitions=None):
+    existing = set(inspect(engine).get_table_names())
+    sources = list(MAP_TABLES) + [COORDS_TABLE]
+    if not set(sources) <= existing:
+        log.warning("Skipping %s: missing %s", MAP_MERGE, ', '.join(sorted(set(sources) - existing)))
+        return None
+    if partitions is None or MAP_MERGE not in existing:
+        tables = {name: pd.read_sql(f"SELECT * FROM {name}", engine) for name in sources}
+        df = build(tables)
+        loader.replace_table(engine, MAP_MERGE, df)
+        log.info("Rebuilt %s: %d rows", MAP_MERGE, len(df))
+        return df
+
+    partitions = sorted(partitions)
+    tables = {name: _read_partitions(engine, name, partitions) for name in MAP_TABLES}
+    tables[COORDS_TABLE] = pd.read_sql(f"SELECT state, district, year, latitude, longitude FROM {COORDS_TABLE} "
+                                       f"WHERE year >= {COORDS_FROM_YEAR}", engine)
+    df = build(tables)
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {MAP_MERGE} WHERE state = :state AND year = :year AND quarter = :quarter"),
+                     [{'state': s, 'year': int(y), 'quarter': int(q)} for s, y, q in partitions])
+        loader.copy_rows(conn, MAP_MERGE, df)
+    log.info("Updated %s: %d partitions, %d rows", MAP_MERGE, len(partitions), len(df))
+    return df
@@ -0,0 +1,100 @@
+# Map data stage for the METRICS tab: aggregates the filtered map frame to a bounded set of
+# points (one per district, per state centroid or per hex bin) with quantized values.
+import numpy as np
+import pandas as pd
+
+
+# Measures summed over the selected quarters
+FLOWS = ['transaction_count', 'transaction_amount', 'insurance_count', 'insurance_amount', 'app_opens']
+
+# Measures that are a running total per quarter: the latest selected quarter is shown
+STOCKS = ['registered_users']
+
+# Level of detail shown in the map's radio button: label -> level
+LEVELS = {'District': 'district', 'State': 'state', 'Hex bins': 'hex'}
+
+# Hex bin size (degrees of longitude between neighbouring bin centres)
+HEX_SIZE = 0.75
+
+# Coordinates are rounded to this many decimals (~100 m), amounts to whole rupees
+COORD_DECIMALS = 3
+
+
+# One point per (state, district) over the selected period
+def district_points(df):
+    if df.empty:
+        return pd.DataFrame(columns=['state', 'label', 'latitude', 'longitude', 'districts'] + FLOWS + STOCKS)
+    df = df.sort_values(['year', 'quarter'])
+    grouped = df.groupby(['state', 'district'], observed=True, sort=False)
+    points = grouped[FLOWS].sum()
+    points[STOCKS] = grouped[STOCKS].last()
+    points[['latitude', 'longitude']] = grouped[['latitude', 'longitude']].first()
+    points['districts'] = 1
+    points = points.reset_index()
+    points['label'] = points['district'].astype(str)
+    return points.drop(columns='district')
+
+
+# Roll district points up to groups; the position is the mean of the member districts
+def _roll_up(points, keys):
+    grouped = points.groupby(keys, observed=True, sort=False)
+    rolled = grouped[FLOWS + STOCKS + ['districts']].sum()
+    rolled[['latitude', 'longitude']] = grouped[['latitude', 'longitude']].mean()
+    return rolled.reset_index()
+
+
+# One point per state (centroid of its districts)
+def state_points(points):
+    rolled = _roll_up(points, ['state'])
+    rolled['label'] = rolled['state'].astype(str)
+    return rolled
+
+
+# Pointy-top hex bins of `size` degrees; each bin is coloured by its largest state
+def hex_points(points, size=HEX_SIZE):
+    if points.empty:
+        return points
+    # Axial hex coordinates, rounded in cube coordinates
+    q = (np.sqrt(3) / 3 * points['longitude'] - points['latitude'] / 3) / size
+    r = (2 / 3 * points['latitude']) / size
+    x, z = q.to_numpy(), r.to_numpy()
+    y = -x - z
+    rx, ry, rz = np.round(x), np.round(y), np.round(z)
+    dx, dy, dz = np.abs(rx - x), np.abs(ry - y), np.abs(rz - z)
+    rx = np.where((dx > dy) & (dx > dz), -ry - rz, rx)
+    rz = np.where(~((dx > dy) & (dx > dz)) & ~(dy > dz), -rx - ry, rz)
+
+    points = points.assign(hex_q=rx.astype(int), hex_r=rz.astype(int))
+    top_state = points.sort_values('transaction_count').groupby(['hex_q', 'hex_r'])['state'].last()
+    rolled = _roll_up(points, ['hex_q', 'hex_r'])
+    rolled['state'] = top_state.reindex(pd.MultiIndex.from_frame(rolled[['hex_q', 'hex_r']])).to_numpy()
+    rolled['label'] = rolled['districts'].astype(str) + ' districts'
+    return rolled.drop(columns=['hex_q', 'hex_r'])
+
+
+# Round coordinates and amounts, narrow dtypes (smaller figure JSON)
+def quantize(points):
+    points = points.copy()
+    points[['latitude', 'longitude']] = points[['latitude', 'longitude']].round(COORD_DECIMALS)
+    for col in FLOWS + STOCKS + ['districts']:
+        points[col] = pd.to_numeric(points[col], errors='coerce').fillna(0).round().astype('int64')
+    return points
+
+
+# Map points for the filtered map frame at the chosen level of detail ('district', 'state' or 'hex')
+def map_points(df, level='district'):
+    points = district_points(df)
+    if level == 'state':
+        points = state_points(points)
+    elif level == 'hex':
+        points = hex_points(points)
+    return quantize(points)[['state', 'label', 'latitude', 'longitude', 'districts'] + FLOWS + STOCKS]
+
+
+# "2022, 2023 · Q1, Q4" for the caption under the map
+def period_label(df):
+    if df.empty:
+        return 'no data'
+    years = ', '.join(str(y) for y in sorted(df['year'].unique()))
+    quarters = ', '.join(f"Q{q}" for q in sorted(df['quarter'].unique()))
+    return f"{years} · {quarters}"
@@ -0,0 +1,114 @@
+# Hot-path timings for the dashboard: wall time, rows and payload bytes of every SQL / Parquet read,
+# merge, filter step and chart, grouped per rerun.
+# Enabled with PHONEPE_PERF=1 (one JSON log line per timing on the 'perf' logger) and/or
+# PHONEPE_PERF_FILE=<path> (JSON lines appended to a metrics file). When disabled, clock() returns
+# None and record() returns at once, so the instrumented code pays two function calls per step.
+#   start = perf.clock()
+#   df = pd.read_sql(...)
+#   perf.record('read_sql', 'map_merge', start, df)
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+import pandas as pd
+
+
+log = logging.getLogger('perf')
+
+METRICS_FILE = os.environ.get('PHONEPE_PERF_FILE')
+ENABLED = os.environ.get('PHONEPE_PERF', '') not in ('', '0') or bool(METRICS_FILE)
+
+# Timings kept in memory for the dashboard's Performance tab (most recent)
+HISTORY = 5000
+
+_history = deque(maxlen=HISTORY)
+_file_lock = threading.Lock()
+_runs = itertools.count(1)
+_local = threading.local()          # Streamlit runs each session's script in its own thread
+
+
+def clock():
+    return time.perf_counter() if ENABLED else None
+
+
+# Start a rerun: later records from this thread carry its id. Returns (run id, start) or (None, None).
+def begin_run():
+    if not ENABLED:
+        return None, None
+    _local.run = next(_runs)
+    return _local.run, time.perf_counter()
+
+
+# fn bound to the current rerun, for work handed to other threads (e.g. a query thread pool)
+def bind(fn):
+    if not ENABLED:
+        return fn
+    run = getattr(_local, 'run', None)
+
+    def bound(*args, **kwargs):
+        _local.run = run
+        return fn(*args, **kwargs)
+    return bound
+
+
+def _points(trace):
+    for attr in ('x', 'lat', 'values', 'labels'):
+        values = getattr(trace, attr, None)
+        if values is not None:
+            return len(values)
+    return 0
+
+
+# Rows and payload bytes of a result: DataFrame (memory), plotly figure (points, JSON sent to the browser)
+def _size(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=True, deep=True).sum())
+    if hasattr(result, 'to_plotly_json'):
+        return sum(_points(trace) for trace in result.data), len(result.to_json())
+    if isinstance(result, (bytes, str)):
+        return None, len(result)
+    return None, None
+
+
+# Record the time since `start` (from clock()) for one step; result, rows & nbytes are optional
+def record(kind, name, start, result=None, rows=None, nbytes=None):
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    if result is not None:
+        size_rows, size_bytes = _size(result)
+        rows = size_rows if rows is None else rows
+        nbytes = size_bytes if nbytes is None else nbytes
+    entry = {'ts': round(time.time(), 3), 'run': getattr(_local, 'run', None), 'kind': kind, 'name': name,
+             'seconds': round(seconds, 6), 'rows': rows, 'bytes': nbytes}
+    _history.append(entry)
+    line = json.dumps(entry)
+    log.info(line)
+    if METRICS_FILE:
+        with _file_lock, open(METRICS_FILE, 'a') as f:
+            f.write(line + '\n')
+
+
+# Timings in memory (optionally of one rerun) as a DataFrame
+def history(run=None):
+    df = pd.DataFrame(list(_history), columns=['ts', 'run', 'kind', 'name', 'seconds', 'rows', 'bytes'])
+    return df if run is None else df[df['run'] == run]
+
+
+# p50 / p95 wall time (ms), median rows & bytes and count per (kind, name), slowest p95 first
+def summary(df=None):
+    df = history() if df is None else df
+    if df.empty:
+        return pd.DataFrame(columns=['kind', 'name', 'n', 'p50_ms', 'p95_ms', 'rows', 'bytes'])
+    grouped = df.groupby(['kind', 'name'])
+    result = pd.DataFrame({
+        'n': grouped.size(),
+        'p50_ms': grouped['seconds'].quantile(0.5) * 1000,
+        'p95_ms': grouped['seconds'].quantile(0.95) * 1000,
+        'rows': grouped['rows'].median(),
+        'bytes': grouped['bytes'].median(),
+    }).round(1).reset_index()
+    return result.sort_values('p95_ms', ascending=False, ignore_index=True)
@@ -0,0 +1,342 @@
+# Headless ingest for cron: runs the ingest as a DAG of stages and writes a JSON run report.
+#   scan                 walk the Pulse tree and compare it with the manifest
+#   load:<dataset>       extract, transform and load one dataset's changed files; datasets run in parallel
+#   rollups, map_merge,  derived tables, each started once the datasets it reads are loaded
+#   growth, ranking
+#   manifest             record the loaded files and bump the data version
+#   snapshot             Parquet snapshot for the dashboard (--snapshot only)
+# Finished stages are checkpointed in <state>/checkpoint.json: after a failure the next run resumes
+# at the failed stage instead of reloading the datasets already done. Exit status: 0 ok, 1 a stage
+# failed (rerun to resume), 3 another run holds the lock, 4 files were skipped (--strict only).
+#   python pipeline.py --root pulse/data --snapshot snapshot
+#   */30 * * * * cd /srv/phonepe && PHONEPE_DB_URL=postgresql://... python pipeline.py --quiet
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+import pandas as pd
+from sqlalchemy.engine import make_url
+import database
+import ingest
+import manifest
+import snapshot
+try:
+    import fcntl                                     # Run lock on POSIX
+except ImportError:
+    fcntl = None
+    import msvcrt                                    # Run lock on Windows
+
+
+log = logging.getLogger(__name__)
+
+# Checkpoint, lock and report of the runs
+STATE_DIR = os.environ.get('PHONEPE_INGEST_STATE', 'ingest_state')
+CHECKPOINT = 'checkpoint.json'
+LOCK = 'ingest.lock'
+REPORT = 'report.json'
+
+# Stages run at the same time (SQLite allows one writer: its stages always run one at a time)
+JOBS = int(os.environ.get('PHONEPE_INGEST_JOBS', 4))
+
+# Milliseconds a statement may run on PostgreSQL, 0 = no limit (default). Not the dashboard's
+# PHONEPE_STATEMENT_TIMEOUT: bulk COPYs, staging tables and index builds run far longer than a chart query.
+STATEMENT_TIMEOUT = int(os.environ.get('PHONEPE_INGEST_STATEMENT_TIMEOUT', 0))
+
+EXIT_OK, EXIT_FAILED, EXIT_LOCKED, EXIT_SKIPPED = 0, 1, 3, 4
+
+LOAD = 'load:'
+
+# Exception raised while parsing a file -> kind of problem reported.
+# Anything else (OSError and subclasses) is 'unreadable'.
+ERROR_KINDS = {
+    'JSONDecodeError': 'malformed', 'UnicodeDecodeError': 'malformed', 'ValueError': 'malformed',
+    'KeyError': 'key_errors', 'IndexError': 'key_errors', 'TypeError': 'key_errors', 'AttributeError': 'key_errors',
+}
+
+
+# Split an ingest error message ("<path>: <exception>: <message>") into its path, kind and error
+def classify(message):
+    match = re.match(r'(.*?\.json): (\w+): (.*)', message, re.S)
+    if not match:
+        return {'path': None, 'kind': 'unreadable', 'error': message}
+    path, exception, text = match.groups()
+    return {'path': path, 'kind': ERROR_KINDS.get(exception, 'unreadable'), 'error': f"{exception}: {text}"}
+
+
+# Lock held for the whole run, released by the OS when the process exits however it ends.
+# Returns the open lock file, or None when another run holds it.
+def acquire_lock(path):
+    f = open(path, 'a+')
+    try:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+# What a checkpoint is valid for: a checkpoint of another tree, database, mode or dataset list is discarded
+def run_key(root, db, datasets, incremental):
+    return {'root': os.path.abspath(root), 'db': make_url(db).render_as_string(hide_password=True),
+            'datasets': sorted(datasets), 'incremental': incremental}
+
+
+# {stage: {'result', 'seconds'}} of the stages a failed run finished
+def read_checkpoint(path, key):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except ValueError:
+        log.warning("Ignoring unreadable checkpoint %s", path)
+        return {}
+    if checkpoint.get('key') != key:
+        log.warning("Ignoring checkpoint %s of another run (%s)", path, checkpoint.get('key'))
+        return {}
+    return checkpoint['stages']
+
+
+def _native(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+# Written to a temporary file and renamed, so a crash never leaves half a checkpoint
+def write_json(path, data):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=1, default=_native)
+    os.replace(path + '.tmp', path)
+
+
+# Run stages {name: (dependencies, function(results))} on a thread pool, each as soon as its
+# dependencies are done. done: {name: result} finished earlier (not run again); on_done(name, result,
+# seconds) is called after each stage. Returns ({name: result}, {name: error}, stages not run).
+def run_stages(stages, jobs, done=None, on_done=None):
+    results = dict(done or {})
+    failed, blocked = {}, set()
+    pending = [name for name in stages if name not in results]
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = stages[name][0]
+                if any(d in failed or d in blocked for d in deps):
+                    pending.remove(name)
+                    blocked.add(name)
+                elif all(d in results for d in deps):
+                    pending.remove(name)
+                    running[pool.submit(_timed, name, stages[name][1], dict(results))] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    log.exception("Stage %s failed", name)
+                    failed[name] = f"{type(e).__name__}: {e}"
+                    continue
+                log.info("Stage %s done in %.2fs", name, seconds)
+                results[name] = result
+                if on_done:
+                    on_done(name, result, seconds)
+    return results, failed, blocked | set(pending)
+
+
+def _timed(name, fn, results):
+    log.info("Stage %s started", name)
+    start = time.perf_counter()
+    result = fn(results)
+    return result, time.perf_counter() - start
+
+
+# Partitions whose content changed, per dataset, from the load stages' results
+def _touched(results):
+    return {name[len(LOAD):]: {tuple(p) for p in result['partitions']}
+            for name, result in results.items() if name.startswith(LOAD) and result['partitions']}
+
+
+def load_stage(engine, name, root, scan, workers, incremental, results):
+    changed, stats, known = scan
+    result = ingest.load_dataset(engine, name, changed, known, workers, incremental)
+    rows = manifest.manifest_rows([f for f in changed if f[0] == name], root, stats, result['digests'])
+    return {'files': result['files'], 'parsed': result['parsed'], 'rows': result['rows'],
+            'errors': result['errors'], 'partitions': sorted(list(p) for p in result['partitions']),
+            'manifest': rows.to_dict('records')}
+
+
+def derived_stage(engine, name, incremental, results):
+    refresh_table, sources = ingest.DERIVED[name]
+    if incremental:
+        touched = {table: p for table, p in _touched(results).items() if table in sources}
+        df = refresh_table(engine, partitions=touched) if touched else None
+    else:
+        loaded = [stage[len(LOAD):] for stage in results if stage.startswith(LOAD)]
+        df = refresh_table(engine, sources=[table for table in loaded if table in sources])
+    return {'rows': None if df is None else len(df)}
+
+
+def manifest_stage(engine, incremental, results):
+    rows = [row for name, result in results.items() if name.startswith(LOAD) for row in result['manifest']]
+    with engine.begin() as conn:
+        manifest.write_manifest(conn, pd.DataFrame(rows, columns=manifest.MANIFEST_COLUMNS))
+        if _touched(results) or not incremental:
+            manifest.bump_version(conn)
+    return {'files': len(rows), 'data_version': int(manifest.read_version(engine))}
+
+
+def snapshot_stage(engine, snapshot_root, results):
+    ingest.write_snapshot(engine, snapshot_root)
+    return {'path': snapshot.current(snapshot_root)}
+
+
+# The stage graph of one run: datasets with changed files (or finished by the resumed run), then
+# the derived tables reading them, the manifest and the snapshot
+def plan(engine, root, scan, datasets, workers, incremental, snapshot_root=None):
+    stages = {}
+    for name in datasets:
+        stages[LOAD + name] = ([], partial(load_stage, engine, name, root, scan, workers, incremental))
+    for name, (_, sources) in ingest.DERIVED.items():
+        deps = [LOAD + s for s in datasets if s in sources]
+        if deps:
+            stages[name] = (deps, partial(derived_stage, engine, name, incremental))
+    stages['manifest'] = (list(stages), partial(manifest_stage, engine, incremental))
+    if snapshot_root:
+        stages['snapshot'] = (['manifest'], partial(snapshot_stage, engine, snapshot_root))
+    return stages
+
+
+# Machine-readable summary of a run
+def report(started, root, incremental, scan, results, stages, failed, blocked):
+    datasets, problems = {}, {'malformed': [], 'key_errors': [], 'unreadable': []}
+    for name, result in results.items():
+        if not name.startswith(LOAD):
+            continue
+        datasets[name[len(LOAD):]] = {'files': result['files'], 'parsed': result['parsed'], 'rows': result['rows'],
+                                      'partitions': len(result['partitions']), 'errors': len(result['errors'])}
+        for message in result['errors']:
+            error = classify(message)
+            problems[error.pop('kind')].append(error)
+    status = 'failed' if failed or blocked else 'ok'
+    return {
+        'run': {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+                'seconds': round(time.time() - started, 3), 'status': status, 'root': os.path.abspath(root),
+                'mode': 'incremental' if incremental else 'full',
+                'data_version': results.get('manifest', {}).get('data_version')},
+        'files': {'scanned': scan['scanned'], 'changed': scan['changed'],
+                  'parsed': sum(d['parsed'] for d in datasets.values()),
+                  **{kind: len(errors) for kind, errors in problems.items()}},
+        'rows': sum(d['rows'] for d in datasets.values()),
+        'datasets': datasets,
+        **problems,
+        'stages': stages,
+        'failed': failed,
+    }
+
+
+# One run end to end; returns (report, exit status)
+def run(db, root=ingest.PULSE_ROOT, datasets=None, incremental=True, snapshot_root=None, state_dir=STATE_DIR,
+        jobs=JOBS, workers=None, fresh=False):
+    started = time.time()
+    datasets = list(datasets or ingest.DATASETS)
+    os.makedirs(state_dir, exist_ok=True)
+    checkpoint_path = os.path.join(state_dir, CHECKPOINT)
+    key = run_key(root, db, datasets, incremental)
+    if fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = read_checkpoint(checkpoint_path, key)
+    if checkpoint:
+        log.info("Resuming: %s already done", ', '.join(checkpoint))
+
+    engine = database.engine(db, statement_timeout=STATEMENT_TIMEOUT)
+    if engine.dialect.name == 'sqlite':
+        jobs = 1
+    workers = max(1, (workers or os.cpu_count() or 1) // jobs)
+    stages, files, changed, results, failed, blocked = {}, [], [], {}, {}, set()
+    try:
+        start = time.perf_counter()
+        try:
+            files = ingest.scan_files(root, datasets)
+            known_manifest = manifest.read_manifest(engine) if incremental else {}
+            changed, stats, known = manifest.stat_changed(files, root, known_manifest)
+        except Exception as e:
+            log.exception("Stage scan failed")
+            failed['scan'] = f"{type(e).__name__}: {e}"
+        else:
+            stages['scan'] = {'status': 'done', 'seconds': round(time.perf_counter() - start, 3)}
+            log.info("Scanned %d files, %d new or changed", len(files), len(changed))
+
+            loaded = [name for name in datasets if any(f[0] == name for f in changed) or LOAD + name in checkpoint]
+            graph = plan(engine, root, (changed, stats, known), loaded, workers, incremental, snapshot_root)
+            done = {name: stage['result'] for name, stage in checkpoint.items() if name in graph}
+            for name in done:
+                stages[name] = {'status': 'resumed', 'seconds': checkpoint[name]['seconds']}
+
+            def on_done(name, result, seconds):
+                stages[name] = {'status': 'done', 'seconds': round(seconds, 3)}
+                checkpoint[name] = {'result': result, 'seconds': round(seconds, 3)}
+                write_json(checkpoint_path, {'key': key, 'stages': checkpoint})
+
+            results, failed, blocked = run_stages(graph, jobs, done, on_done)
+    finally:
+        engine.dispose()
+    for name, error in failed.items():
+        stages[name] = {'status': 'failed', 'error': error}
+    for name in sorted(blocked):
+        stages[name] = {'status': 'blocked'}
+
+    summary = report(started, root, incremental, {'scanned': len(files), 'changed': len(changed)},
+                     results, stages, failed, blocked)
+    if failed or blocked:
+        return summary, EXIT_FAILED
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    skipped = sum(summary['files'][kind] for kind in ('malformed', 'key_errors', 'unreadable'))
+    return summary, EXIT_SKIPPED if skipped else EXIT_OK
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest the PhonePe Pulse tree into the database (cron-friendly)")
+    parser.add_argument('--root', default=ingest.PULSE_ROOT, help="Pulse data tree (default: pulse/data)")
+    parser.add_argument('--db', default=database.DB_URL, help="SQLAlchemy database URL (default: $PHONEPE_DB_URL)")
+    parser.add_argument('--datasets', nargs='+', choices=list(ingest.DATASETS), help="datasets to load (default: all)")
+    parser.add_argument('--full', action='store_true', help="reload every file and replace the tables")
+    parser.add_argument('--snapshot', metavar='DIR', help="also write the dashboard's Parquet snapshot there")
+    parser.add_argument('--state', default=STATE_DIR,
+                        help="folder of the checkpoint, lock and report (default: $PHONEPE_INGEST_STATE or ingest_state)")
+    parser.add_argument('--report', help="JSON report path, '-' for stdout (default: <state>/report.json)")
+    parser.add_argument('--jobs', type=int, default=JOBS, help="stages run at the same time")
+    parser.add_argument('--workers', type=int, help="parse processes in total (default: all cores)")
+    parser.add_argument('--fresh', action='store_true', help="discard the checkpoint of a failed run")
+    parser.add_argument('--strict', action='store_true', help=f"exit {EXIT_SKIPPED} when files were skipped")
+    parser.add_argument('--log-file', help="log to this file instead of stderr")
+    parser.add_argument('--quiet', action='store_true', help="log warnings and errors only")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, filename=args.log_file,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    os.makedirs(args.state, exist_ok=True)
+    lock = acquire_lock(os.path.join(args.state, LOCK))
+    if lock is None:
+        log.warning("Another ingest holds %s, exiting", os.path.join(args.state, LOCK))
+        sys.exit(EXIT_LOCKED)
+
+    summary, status = run(args.db, args.root, args.datasets, not args.full, args.snapshot, args.state,
+                          max(1, args.jobs), args.workers, args.fresh)
+    if args.report == '-':
+        json.dump(summary, sys.stdout, indent=1, default=_native)
+        print()
+    else:
+        write_json(args.report or os.path.join(args.state, REPORT), summary)
+    log.info("Ingest %s: %d files parsed, %d rows, %d malformed, %d key errors", summary['run']['status'],
+             summary['files']['parsed'], summary['rows'], summary['files']['malformed'], summary['files']['key_errors'])
+    sys.exit(status if status != EXIT_SKIPPED or args.strict else EXIT_OK)
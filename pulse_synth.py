@@ -0,0 +1,154 @@
+# Synthetic PhonePe Pulse tree for benchmarks and offline runs.
+# Writes <root>/<dataset folder>/<state>/<year>/<quarter>.json for every dataset in ingest.DATASETS,
+# with the JSON shapes of the real repository (hoverDataList, hoverData, transactionData,
+# usersByDevice, districts / pincodes ...), for any number of states x districts x years x quarters.
+import argparse
+import json
+import os
+import random
+import ingest
+
+
+# Real state folder names first; more states get generated names
+STATES = ['andaman-&-nicobar-islands', 'andhra-pradesh', 'arunachal-pradesh', 'assam', 'bihar', 'chandigarh',
+          'chhattisgarh', 'dadra-&-nagar-haveli-&-daman-&-diu', 'delhi', 'goa', 'gujarat', 'haryana',
+          'himachal-pradesh', 'jammu-&-kashmir', 'jharkhand', 'karnataka', 'kerala', 'ladakh', 'lakshadweep',
+          'madhya-pradesh', 'maharashtra', 'manipur', 'meghalaya', 'mizoram', 'nagaland', 'odisha', 'puducherry',
+          'punjab', 'rajasthan', 'sikkim', 'tamil-nadu', 'telangana', 'tripura', 'uttar-pradesh', 'uttarakhand',
+          'west-bengal']
+
+PAYMENT_TYPES = ['Recharge & bill payments', 'Peer-to-peer payments', 'Merchant payments', 'Financial Services', 'Others']
+BRANDS = ['Xiaomi', 'Samsung', 'Vivo', 'Oppo', 'OnePlus', 'Realme', 'Apple', 'Motorola', 'Others']
+
+# Insurance data starts in 2020, device data stops after 2022 Q1 (as in the real repository)
+INSURANCE_FROM_YEAR = 2020
+DEVICES_UNTIL = (2022, 1)
+
+# Rows in the top_* files
+TOP_DISTRICTS = 10
+TOP_PINCODES = 10
+
+
+def _states(n):
+    return STATES[:n] + [f'state-{i}' for i in range(len(STATES), n)]
+
+
+# Districts of one state: name in the hover files ('... district', lower case) and in map_country_insurance
+def _districts(state_no, n):
+    names = [f'district {state_no}-{j}' for j in range(n)]
+    return [(f'{name} district', name.title()) for name in names]
+
+
+def _total(count, amount):
+    return [{'type': 'TOTAL', 'count': count, 'amount': amount}]
+
+
+def _map_transaction(rng, districts, pincodes):
+    return {'hoverDataList': [{'name': hover, 'metric': _total(rng.randint(10_000, 10_000_000), rng.uniform(1e7, 1e10))}
+                              for hover, _ in districts]}
+
+
+def _map_insurance(rng, districts, pincodes):
+    return {'hoverDataList': [{'name': hover, 'metric': _total(rng.randint(10, 10_000), rng.uniform(1e4, 1e7))}
+                              for hover, _ in districts]}
+
+
+def _map_country_insurance(rng, districts, pincodes):
+    return {'data': {'columns': ['lat', 'lng', 'metric', 'label'],
+                     'data': [[rng.uniform(8, 34), rng.uniform(69, 96), rng.randint(1, 10_000), label]
+                              for _, label in districts]}}
+
+
+def _map_user(rng, districts, pincodes):
+    return {'hoverData': {hover: {'registeredUsers': rng.randint(1000, 1_000_000), 'appOpens': rng.randint(0, 100_000_000)}
+                          for hover, _ in districts}}
+
+
+def _aggregated_transaction(rng, districts, pincodes):
+    return {'from': 0, 'to': 0,
+            'transactionData': [{'name': name, 'paymentInstruments': _total(rng.randint(1000, 100_000_000), rng.uniform(1e6, 1e11))}
+                                for name in PAYMENT_TYPES]}
+
+
+def _aggregated_user(rng, districts, pincodes, with_devices=True):
+    devices = [{'brand': b, 'count': rng.randint(1000, 1_000_000), 'percentage': rng.random()} for b in BRANDS]
+    return {'aggregated': {'registeredUsers': rng.randint(100_000, 100_000_000), 'appOpens': rng.randint(0, 1_000_000_000)},
+            'usersByDevice': devices if with_devices else None}
+
+
+def _aggregated_insurance(rng, districts, pincodes):
+    return {'from': 0, 'to': 0,
+            'transactionData': [{'name': 'Insurance', 'paymentInstruments': _total(rng.randint(10, 100_000), rng.uniform(1e4, 1e8))}]}
+
+
+def _top_metric(rng, districts, pincodes):
+    metric = lambda: {'type': 'TOTAL', 'count': rng.randint(1000, 10_000_000), 'amount': rng.uniform(1e6, 1e10)}
+    return {'states': None,
+            'districts': [{'entityName': label.lower(), 'metric': metric()} for _, label in districts[:TOP_DISTRICTS]],
+            'pincodes': [{'entityName': p, 'metric': metric()} for p in pincodes]}
+
+
+def _top_user(rng, districts, pincodes):
+    return {'states': None,
+            'districts': [{'name': label.lower(), 'registeredUsers': rng.randint(1000, 1_000_000)}
+                          for _, label in districts[:TOP_DISTRICTS]],
+            'pincodes': [{'name': p, 'registeredUsers': rng.randint(100, 100_000)} for p in pincodes]}
+
+
+# Dataset -> builder of the file's "data" object (rng, [(hover name, label)], [pincodes])
+BUILDERS = {
+    'map_transaction': _map_transaction,
+    'map_insurance': _map_insurance,
+    'map_country_insurance': _map_country_insurance,
+    'map_user': _map_user,
+    'aggregated_transaction': _aggregated_transaction,
+    'aggregated_user': _aggregated_user,
+    'aggregated_insurance': _aggregated_insurance,
+    'top_transaction': _top_metric,
+    'top_user': _top_user,
+    'top_insurance': _top_metric,
+}
+
+
+# Write the tree; returns the number of files written
+def generate(root, states=36, districts=20, years=range(2018, 2025), quarters=(1, 2, 3, 4), seed=0, datasets=None):
+    count = 0
+    for state_no, state in enumerate(_states(states)):
+        names = _districts(state_no, districts)
+        pincodes = [str(110000 + state_no * 1000 + k) for k in range(TOP_PINCODES)]
+        for year in years:
+            for quarter in quarters:
+                for name in datasets or BUILDERS:
+                    if 'insurance' in name and year < INSURANCE_FROM_YEAR:
+                        continue
+                    # One generator per file: the same file always gets the same numbers
+                    rng = random.Random(f'{seed}/{name}/{state}/{year}/{quarter}')
+                    if name == 'aggregated_user':
+                        data = _aggregated_user(rng, names, pincodes, (year, quarter) <= DEVICES_UNTIL)
+                    else:
+                        data = BUILDERS[name](rng, names, pincodes)
+                    folder = os.path.join(root, *ingest.DATASETS[name]['path'].split('/'), state, str(year))
+                    os.makedirs(folder, exist_ok=True)
+                    with open(os.path.join(folder, f'{quarter}.json'), 'w') as f:
+                        json.dump({'success': True, 'code': 'SUCCESS', 'data': data, 'responseTimestamp': 0}, f)
+                    count += 1
+    return count
+
+
+# "2018-2024" -> range(2018, 2025)
+def year_range(text):
+    first, _, last = text.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic PhonePe Pulse data tree")
+    parser.add_argument('root', help="output folder (used like pulse/data)")
+    parser.add_argument('--states', type=int, default=36)
+    parser.add_argument('--districts', type=int, default=20, help="districts per state")
+    parser.add_argument('--years', type=year_range, default=range(2018, 2025), help="e.g. 2018-2024")
+    parser.add_argument('--quarters', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    n = generate(args.root, args.states, args.districts, args.years, range(1, args.quarters + 1), args.seed)
+    print(f"{n} files written to {args.root}")
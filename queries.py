@@ -0,0 +1,172 @@
+# SQL for the Business Case Study charts in Dashboard.py (q1 - q36)
+# All charts read the pre-aggregated rollup tables built by rollups.py, not the raw fact tables.
+# AVG() over raw rows is SUM(measure) / SUM(n_rows) on a rollup.
+# Growth charts (q2, q9, q22) look their years up in the growth table built by growth.py, and
+# the top-N state / district / pincode charts read the leaderboards built by ranking.py.
+
+QUERIES = {}
+
+# Default bind parameters (:name placeholders) for the parameterized queries.
+# A NULL year pair compares the latest year in the data with the year before it.
+PARAMS = {
+    'q9': {'from_year': None, 'to_year': None},
+    'q22': {'from_year': None, 'to_year': None},
+}
+
+
+# Yearly values of a state metric for a pair of years, side by side: state, from_year, to_year,
+# value_from, value_to (0 when a state has no data for a year). Reads two rows per state.
+def _year_pair(metric):
+    return f"""WITH latest AS (SELECT COALESCE(:to_year, MAX(year)) AS to_year FROM growth
+WHERE metric = '{metric}' AND grain = 'state' AND quarter = 0),
+pair AS (SELECT COALESCE(:from_year, to_year - 1) AS from_year, to_year FROM latest)
+SELECT g.state, p.from_year, p.to_year,
+SUM(CASE WHEN g.year = p.from_year THEN g.value ELSE 0 END) AS value_from,
+SUM(CASE WHEN g.year = p.to_year THEN g.value ELSE 0 END) AS value_to
+FROM growth g JOIN pair p ON g.year IN (p.from_year, p.to_year)
+WHERE g.metric = '{metric}' AND g.grain = 'state' AND g.quarter = 0
+GROUP BY g.state, p.from_year, p.to_year"""
+
+
+# First `k` entries of a country-wide, all-years leaderboard (ranking.py), as (entry, value AS `alias`)
+def _leaders(source, metric, grain, entry, alias, k):
+    return f"""SELECT {entry}, value AS {alias} FROM ranking
+WHERE source = '{source}' AND metric = '{metric}' AND grain = '{grain}' AND scope = 'india' AND year = 0 AND quarter = 0
+ORDER BY rank LIMIT {k}"""
+
+
+# Query 1: Total Transaction Amount by State
+QUERIES['q1'] = """SELECT state, SUM(transaction_amount) AS total_amount FROM rollup_aggregated_transaction_sq
+GROUP BY state ORDER BY total_amount DESC"""
+
+# Query 2: Year-over-Year Decline in Transaction Amount
+QUERIES['q2'] = """SELECT state, year, value AS present_year_totalamt, previous AS previous_year_totalamt,
+pct AS percentage FROM growth
+WHERE metric = 'transaction_amount' AND grain = 'state' AND quarter = 0 AND delta < 0
+ORDER BY percentage"""
+
+# Query 3: Transaction Breakdown by Payment Type
+QUERIES['q3'] = """SELECT type_payments, SUM(transaction_count) AS total_count, SUM(transaction_amount) AS total_amount
+FROM rollup_aggregated_transaction_sq GROUP BY type_payments"""
+
+# Query 4: Average Transaction Amount by State
+QUERIES['q4'] = """SELECT state, SUM(transaction_amount) / SUM(n_rows) AS avg_amount FROM rollup_aggregated_transaction_sq
+GROUP BY state ORDER BY avg_amount DESC"""
+
+# Query 5: National Transaction Trend by Quarter
+QUERIES['q5'] = """SELECT year, quarter, SUM(transaction_amount) AS total_amount FROM rollup_aggregated_transaction_sq
+GROUP BY year, quarter ORDER BY year, quarter"""
+
+# Query 6: Registered Users by Device Brand
+QUERIES['q6'] = """SELECT brand, SUM(count) AS total_users FROM rollup_aggregated_user_sq
+GROUP BY brand ORDER BY total_users DESC"""
+
+# Query 7: Top 5 Brands by App Opens
+QUERIES['q7'] = """SELECT state, SUM(appopens) AS opens FROM rollup_aggregated_user_sq WHERE brand != 'None'
+GROUP BY state ORDER BY state DESC LIMIT 5"""
+
+# Query 8: App Opens to User Ratio by Brand
+QUERIES['q8'] = """SELECT brand, SUM(appopens)/SUM(count) AS open_to_user_ratio FROM rollup_aggregated_user_sq
+GROUP BY brand ORDER BY open_to_user_ratio DESC"""
+
+# Query 9: User Growth Percentage between two years (default: the last two)
+QUERIES['q9'] = f"""SELECT state, from_year, to_year, value_from AS users_from, value_to AS users_to,
+value_to - value_from AS growth, (value_to - value_from) / NULLIF(value_from, 0) * 100 AS growth_percentage
+FROM ({_year_pair('registered_users')}) pair
+ORDER BY growth_percentage DESC"""
+
+# Query 10: Insurance Transaction Amount by State
+QUERIES['q10'] = """SELECT year, state, SUM(amount) AS total_ins_amt, RANK() OVER (ORDER BY SUM(amount) DESC) AS rank
+FROM rollup_top_insurance_sq GROUP BY state, year
+ORDER BY rank ASC LIMIT 10"""
+
+# Query 11: Yearly Insurance Growth Trend
+QUERIES['q11'] = """SELECT year, SUM(amount) AS total_amount FROM rollup_aggregated_insurance_sq GROUP BY year ORDER BY year"""
+
+# Query 12: Insurance Market Share by State
+QUERIES['q12'] = """SELECT state, SUM(amount) AS total_amount FROM rollup_aggregated_insurance_sq GROUP BY state"""
+
+# Query 13: Top 5 States by Insurance Policy Count
+QUERIES['q13'] = _leaders('aggregated_insurance', 'count', 'state', 'state', 'total_policies', 5)
+
+# Query 14: Avg Transaction Amount by State
+QUERIES['q14'] = """SELECT state, SUM(transaction_amount) / SUM(n_rows) AS avg_amount FROM rollup_map_transaction_sq
+GROUP BY state ORDER BY avg_amount ASC LIMIT 5"""
+
+# Query 15: Transaction Trend Over Time
+QUERIES['q15'] = """SELECT year, quarter, SUM(transaction_amount) AS total_amount FROM rollup_map_transaction_sq
+GROUP BY year, quarter ORDER BY year, quarter"""
+
+# Query 16: Top 10 Districts by Transaction Amount
+QUERIES['q16'] = _leaders('map_transaction', 'transaction_amount', 'district', 'district', 'total_amount', 10)
+
+# Query 17: Average Transaction Amount per State
+QUERIES['q17'] = """SELECT state, SUM(transaction_amount) / SUM(n_rows) AS avg_amount FROM rollup_map_transaction_sq
+GROUP BY state ORDER BY avg_amount DESC"""
+
+# Query 18: Transaction Count Yearly Trend
+QUERIES['q18'] = """SELECT year, SUM(transaction_count) AS total_txns FROM rollup_map_transaction_sq GROUP BY year ORDER BY year"""
+
+# Query 19: Registered Users by State
+QUERIES['q19'] = """SELECT state, SUM(registered_users) AS total_users FROM rollup_map_user_sq
+GROUP BY state ORDER BY total_users DESC"""
+
+# Query 20: Top 10 Districts by Registered Users
+QUERIES['q20'] = _leaders('map_user', 'registered_users', 'district', 'district', 'total_users', 10)
+
+# Query 21: Quarterly Registered Users Over Time
+QUERIES['q21'] = """SELECT year, quarter, SUM(registered_users) AS users FROM rollup_map_user_sq
+GROUP BY year, quarter ORDER BY year, quarter"""
+
+# Query 22: User Growth by State Over Years
+QUERIES['q22'] = f"""SELECT state, from_year, to_year, value_from AS users_from, value_to AS users_to,
+value_to - value_from AS growth, (value_to - value_from) / NULLIF(value_to, 0) * 100 AS growth_percentage
+FROM ({_year_pair('registered_users')}) pair
+ORDER BY growth_percentage DESC LIMIT 5"""
+
+# Query 23: Top Districts per Year by User Registrations (same result as Query 20)
+QUERIES['q23'] = QUERIES['q20']
+
+# Query 24: Insurance Amount by State
+QUERIES['q24'] = """SELECT state, SUM(amount) AS total_amount FROM rollup_top_insurance_sq
+GROUP BY state ORDER BY total_amount DESC"""
+
+# Query 25: Top 10 Districts by Insurance Amount
+QUERIES['q25'] = _leaders('top_insurance', 'amount', 'district', 'district', 'total_amount', 10)
+
+# Query 26: Top 10 Pincodes by Insurance Amount
+QUERIES['q26'] = _leaders('top_insurance', 'amount', 'pincode', 'pincode', 'total_amount', 10)
+
+# Query 27: Insurance Transactions Over Time
+QUERIES['q27'] = """SELECT year, quarter, SUM(amount) AS total_amount FROM rollup_top_insurance_sq
+GROUP BY year, quarter ORDER BY quarter ASC"""
+
+# Query 28: Top Districts by Insurance per Year
+QUERIES['q28'] = """SELECT year, district, SUM(amount) AS total_amount FROM rollup_top_insurance_dy
+GROUP BY year, district ORDER BY total_amount DESC LIMIT 10"""
+
+# Query 29: Total Transactions by State
+QUERIES['q29'] = """SELECT quarter, SUM(transaction_amount) AS total_amount FROM rollup_map_transaction_sq
+GROUP BY quarter ORDER BY total_amount DESC"""
+
+# Query 30: Top 10 Districts by Transaction Amount (same result as Query 16)
+QUERIES['q30'] = QUERIES['q16']
+
+# Query 31: Top 10 Pincodes by Transaction Amount
+QUERIES['q31'] = _leaders('top_transaction', 'amount', 'pincode', 'pincode', 'total_amount', 10)
+
+# Query 32: Yearly Transaction Amount (Nationwide)
+QUERIES['q32'] = """SELECT year, SUM(transaction_amount) AS total_amount FROM rollup_map_transaction_sq GROUP BY year"""
+
+# Query 33: Top Districts by Yearly Transactions
+QUERIES['q33'] = """SELECT district, year, SUM(transaction_amount) AS total FROM rollup_map_transaction_dy
+GROUP BY district, year ORDER BY total DESC LIMIT 10"""
+
+# Query 34: Top 10 Pincodes by User Registrations
+QUERIES['q34'] = _leaders('top_user', 'registeredusers', 'pincode', 'pincode', 'total_users', 10)
+
+# Query 35: Quarterly User Registration Trends (same result as Query 21)
+QUERIES['q35'] = QUERIES['q21']
+
+# Query 36: User Growth by Year
+QUERIES['q36'] = """SELECT year, SUM(registered_users) AS users FROM rollup_map_user_sq GROUP BY year ORDER BY year DESC"""
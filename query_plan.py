@@ -0,0 +1,126 @@
+# Query plan for the Business Case Study charts: one GROUPING SETS query per rollup table and data
+# version returns every grouping its charts need, and each chart's result is sliced from it in pandas.
+# 12 scans of the rollup tables replace one scan per chart (q1 - q36).
+# SQLite has no GROUPING SETS, so there the same rows come from one UNION ALL statement.
+import pandas as pd
+import rollups
+
+
+def _out(df, dims, **measures):
+    result = df[dims].copy()
+    for name, values in measures.items():
+        result[name] = values
+    return result.reset_index(drop=True)
+
+
+def _top(df, column, n=None, ascending=False):
+    df = df.sort_values(column, ascending=ascending, kind='stable')
+    return (df if n is None else df.head(n)).reset_index(drop=True)
+
+
+# Query name: (rollup table, grouping, function(grouped rows, bind parameters) -> chart data).
+# Matches queries.QUERIES: same columns, order and limits. The growth charts (q2, q9, q22) and the top-N
+# charts (leaderboards from ranking.py) are indexed lookups and run their own SQL.
+SLICES = {
+    'q1': ('rollup_aggregated_transaction_sq', ['state'],
+           lambda df, p: _top(_out(df, ['state'], total_amount=df['transaction_amount']), 'total_amount')),
+    'q3': ('rollup_aggregated_transaction_sq', ['type_payments'],
+           lambda df, p: _out(df, ['type_payments'], total_count=df['transaction_count'], total_amount=df['transaction_amount'])),
+    'q4': ('rollup_aggregated_transaction_sq', ['state'],
+           lambda df, p: _top(_out(df, ['state'], avg_amount=df['transaction_amount'] / df['n_rows']), 'avg_amount')),
+    'q5': ('rollup_aggregated_transaction_sq', ['year', 'quarter'],
+           lambda df, p: _top(_out(df, ['year', 'quarter'], total_amount=df['transaction_amount']), ['year', 'quarter'], ascending=True)),
+    'q6': ('rollup_aggregated_user_sq', ['brand'],
+           lambda df, p: _top(_out(df, ['brand'], total_users=df['count']), 'total_users')),
+    'q7': ('rollup_aggregated_user_sq', ['state', 'brand'],
+           lambda df, p: _top(df[df['brand'].notna() & (df['brand'] != 'None')].groupby('state', as_index=False)['appopens'].sum()
+                              .rename(columns={'appopens': 'opens'}), 'state', 5)),
+    'q8': ('rollup_aggregated_user_sq', ['brand'],
+           lambda df, p: _top(_out(df, ['brand'], open_to_user_ratio=df['appopens'] / df['count']), 'open_to_user_ratio')),
+    'q10': ('rollup_top_insurance_sq', ['state', 'year'],
+            lambda df, p: _top(_out(df, ['year', 'state'], total_ins_amt=df['amount'],
+                                    rank=df['amount'].rank(method='min', ascending=False).astype('int64')), 'rank', 10, True)),
+    'q11': ('rollup_aggregated_insurance_sq', ['year'],
+            lambda df, p: _top(_out(df, ['year'], total_amount=df['amount']), 'year', ascending=True)),
+    'q12': ('rollup_aggregated_insurance_sq', ['state'], lambda df, p: _out(df, ['state'], total_amount=df['amount'])),
+    'q14': ('rollup_map_transaction_sq', ['state'],
+            lambda df, p: _top(_out(df, ['state'], avg_amount=df['transaction_amount'] / df['n_rows']), 'avg_amount', 5, True)),
+    'q15': ('rollup_map_transaction_sq', ['year', 'quarter'],
+            lambda df, p: _top(_out(df, ['year', 'quarter'], total_amount=df['transaction_amount']), ['year', 'quarter'], ascending=True)),
+    'q17': ('rollup_map_transaction_sq', ['state'],
+            lambda df, p: _top(_out(df, ['state'], avg_amount=df['transaction_amount'] / df['n_rows']), 'avg_amount')),
+    'q18': ('rollup_map_transaction_sq', ['year'],
+            lambda df, p: _top(_out(df, ['year'], total_txns=df['transaction_count']), 'year', ascending=True)),
+    'q19': ('rollup_map_user_sq', ['state'],
+            lambda df, p: _top(_out(df, ['state'], total_users=df['registered_users']), 'total_users')),
+    'q21': ('rollup_map_user_sq', ['year', 'quarter'],
+            lambda df, p: _top(_out(df, ['year', 'quarter'], users=df['registered_users']), ['year', 'quarter'], ascending=True)),
+    'q24': ('rollup_top_insurance_sq', ['state'],
+            lambda df, p: _top(_out(df, ['state'], total_amount=df['amount']), 'total_amount')),
+    'q27': ('rollup_top_insurance_sq', ['year', 'quarter'],
+            lambda df, p: _top(_out(df, ['year', 'quarter'], total_amount=df['amount']), 'quarter', ascending=True)),
+    'q28': ('rollup_top_insurance_dy', ['year', 'district'],
+            lambda df, p: _top(_out(df, ['year', 'district'], total_amount=df['amount']), 'total_amount', 10)),
+    'q29': ('rollup_map_transaction_sq', ['quarter'],
+            lambda df, p: _top(_out(df, ['quarter'], total_amount=df['transaction_amount']), 'total_amount')),
+    'q32': ('rollup_map_transaction_sq', ['year'], lambda df, p: _out(df, ['year'], total_amount=df['transaction_amount'])),
+    'q33': ('rollup_map_transaction_dy', ['district', 'year'],
+            lambda df, p: _top(_out(df, ['district', 'year'], total=df['transaction_amount']), 'total', 10)),
+    'q36': ('rollup_map_user_sq', ['year'],
+            lambda df, p: _top(_out(df, ['year'], users=df['registered_users']), 'year')),
+}
+
+# Charts that show the same result as another one (see queries.py)
+SLICES['q35'] = SLICES['q21']
+
+# Rollup table -> groupings used by its charts
+GROUPINGS = {}
+for _table, _by, _ in SLICES.values():
+    GROUPINGS.setdefault(_table, [])
+    if tuple(_by) not in GROUPINGS[_table]:
+        GROUPINGS[_table].append(tuple(_by))
+
+
+def _dimensions(table):
+    return list(dict.fromkeys(col for by in GROUPINGS[table] for col in by))
+
+
+# GROUPING(...) bit mask of a grouping: a bit is set for every dimension it does not group by
+def grouping_id(table, by):
+    dims = _dimensions(table)
+    return sum(1 << (len(dims) - 1 - i) for i, col in enumerate(dims) if col not in by)
+
+
+# One statement returning every grouping of a rollup table, tagged with grouping_id.
+# grouping_sets=False: UNION ALL of one GROUP BY per grouping (SQLite)
+def grouping_sql(table, grouping_sets=True):
+    dims = _dimensions(table)
+    measures = [f"SUM({m}) AS {m}" for m in rollups.ROLLUPS[table][2]] + ['SUM(n_rows) AS n_rows']
+    if grouping_sets:
+        sets = ', '.join(f"({', '.join(by)})" for by in GROUPINGS[table])
+        return (f"SELECT {', '.join(dims)}, GROUPING({', '.join(dims)}) AS grouping_id, {', '.join(measures)} "
+                f"FROM {table} GROUP BY GROUPING SETS ({sets})")
+    selects = []
+    for by in GROUPINGS[table]:
+        cols = [col if col in by else f"NULL AS {col}" for col in dims]
+        selects.append(f"SELECT {', '.join(cols)}, {grouping_id(table, by)} AS grouping_id, {', '.join(measures)} "
+                       f"FROM {table} GROUP BY {', '.join(by)}")
+    return ' UNION ALL '.join(selects)
+
+
+# Measures as floats (PostgreSQL returns NUMERIC sums as Decimal)
+def prepare(table, df):
+    for col in list(rollups.ROLLUPS[table][2]) + ['n_rows']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+# Chart data for one query from its table's grouped rows
+def slice_result(name, grouped, params=None):
+    table, by, build = SLICES[name]
+    df = grouped[grouped['grouping_id'] == grouping_id(table, by)]
+    df = df[list(by) + list(rollups.ROLLUPS[table][2]) + ['n_rows']].reset_index(drop=True)
+    for col in by:
+        if col in ('year', 'quarter', 'pincode'):
+            df[col] = df[col].astype('int64')
+    return build(df, params or {})
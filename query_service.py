@@ -0,0 +1,149 @@
+# Cached, parameterized query service for the dashboard charts
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import text
+import manifest
+import perf
+import query_plan
+from queries import PARAMS, QUERIES
+
+
+# Cache settings (override with environment variables)
+CACHE_TTL = float(os.environ.get('PHONEPE_CACHE_TTL', 3600))      # seconds a result stays valid
+CACHE_SIZE = int(os.environ.get('PHONEPE_CACHE_SIZE', 256))       # max cached results (LRU)
+VERSION_TTL = float(os.environ.get('PHONEPE_VERSION_TTL', 30))    # seconds between data-version checks
+QUERY_PLAN = os.environ.get('PHONEPE_QUERY_PLAN', '1') not in ('', '0')  # slice charts from grouped rows (query_plan.py)
+
+
+# Process-wide state shared by every Streamlit session
+_cache = OrderedDict()          # key -> (expires_at, DataFrame)
+_cache_lock = threading.Lock()
+_key_locks = {}                 # key -> Lock, so concurrent viewers run a query once
+_version = {'value': None, 'checked_at': 0.0}
+
+
+# Current data version (stamp written by the last ingest), re-read at most every VERSION_TTL seconds.
+# When it changes, every cached result from the older version is dropped.
+def data_version(engine):
+    now = time.monotonic()
+    with _cache_lock:
+        if _version['value'] is not None and now - _version['checked_at'] < VERSION_TTL:
+            return _version['value']
+    version = manifest.read_version(engine)
+    with _cache_lock:
+        if version != _version['value']:
+            for key in [k for k in _cache if k[2] != version]:
+                del _cache[key]
+        _version.update(value=version, checked_at=now)
+    return version
+
+
+# Execute SQL with :name parameters on a SQLAlchemy engine or a native duckdb connection
+# (snapshot.connect(), where parameters are $name and each thread needs its own cursor).
+# binds: expanding bind parameters (data_access.where_clause) - `IN :name` takes a list of values.
+def read(engine, sql, params=None, binds=()):
+    params = params or {}
+    if type(engine).__module__.lstrip('_').startswith('duckdb'):
+        params = dict(params)
+        for bind in binds:
+            values = params.pop(bind.key)
+            names = [f'{bind.key}_{i}' for i in range(len(values))]
+            sql = re.sub(rf'(?<![:\w]):{bind.key}\b', '(' + ', '.join(':' + n for n in names) + ')', sql)
+            params.update(zip(names, values))
+        return engine.cursor().execute(re.sub(r'(?<![:\w]):(\w+)', r'$\1', sql), params).df()
+    return pd.read_sql(text(sql).bindparams(*binds), engine, params=params)
+
+
+def _get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return entry[1]
+
+
+def _put(key, df):
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + CACHE_TTL, df)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# Cached result for `key`, computed once even when several viewers ask for it at the same time
+def _cached(key, compute):
+    df = _get(key)
+    if df is not None:
+        return df
+
+    with _cache_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        df = _get(key)
+        if df is None:
+            df = compute()
+            _put(key, df)
+    with _cache_lock:
+        _key_locks.pop(key, None)
+    return df
+
+
+def _grouping_sets(engine):
+    if type(engine).__module__.lstrip('_').startswith('duckdb'):
+        return True
+    return engine.dialect.name in ('postgresql', 'duckdb')
+
+
+# Every grouping of one rollup table that the charts use (one query per table and data version)
+def grouped(engine, table, version):
+    sql = query_plan.grouping_sql(table, _grouping_sets(engine))
+
+    def compute():
+        start = perf.clock()
+        df = query_plan.prepare(table, read(engine, sql))
+        perf.record('read_sql', table, start, df)
+        return df
+    return _cached((sql, (), version), compute)
+
+
+# Run a named query from queries.QUERIES with optional bind parameters.
+# Charts covered by query_plan.SLICES are sliced from their table's grouped rows instead of
+# running their own SQL. Results are cached on (query, parameters, data version); the returned
+# DataFrame is shared, so callers must not modify it in place.
+def run(engine, name, **params):
+    sql = QUERIES[name]
+    params = {**PARAMS.get(name, {}), **params}
+    version = data_version(engine)
+
+    if QUERY_PLAN and name in query_plan.SLICES:
+        table = query_plan.SLICES[name][0]
+
+        def compute():
+            df = grouped(engine, table, version)
+            start = perf.clock()
+            result = query_plan.slice_result(name, df, params)
+            perf.record('slice', name, start, result)
+            return result
+        return _cached((f'plan:{name}', tuple(sorted(params.items())), version), compute)
+
+    def compute():
+        start = perf.clock()
+        df = read(engine, sql, params)
+        perf.record('read_sql', name, start, df)
+        return df
+    return _cached((sql, tuple(sorted(params.items())), version), compute)
+
+
+# Drop every cached result (e.g. right after an ingest in the same process)
+def invalidate():
+    with _cache_lock:
+        _cache.clear()
+        _version.update(value=None, checked_at=0.0)
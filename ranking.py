@@ -0,0 +1,145 @@
+# Ranking store (ranking): leaderboards of every measure at state, district and pincode grain,
+# built once per ingest. A board is one (source, metric, grain, scope, year, quarter): scope is
+# 'india' or one state, year 0 = all years, quarter 0 = the whole year. Each row carries its dense
+# rank (1 = largest), and the table is indexed on the board plus rank, so top-K, bottom-K and the
+# rank of one district / pincode read K rows instead of sorting the aggregated set per request.
+import logging
+import pandas as pd
+from sqlalchemy import inspect, text
+import loader
+import perf
+
+
+log = logging.getLogger(__name__)
+
+RANKING = 'ranking'
+
+# Scope of the country-wide boards (states are ranked there only)
+INDIA = 'india'
+
+# Grain -> (columns identifying an entry, rows of the source table it ranks)
+GRAINS = {
+    'state': (['state'], None),
+    'district': (['state', 'district'], 'district IS NOT NULL'),
+    'pincode': (['state', 'pincode'], 'pincode > 0'),        # pincode 0: district rows of the top_* tables
+}
+
+# Source table -> (summed measures, grains ranked)
+SOURCES = {
+    'aggregated_transaction': (['transaction_count', 'transaction_amount'], ['state']),
+    'aggregated_insurance': (['count', 'amount'], ['state']),
+    'map_transaction': (['transaction_count', 'transaction_amount'], ['state', 'district']),
+    'map_user': (['registered_users', 'app_opens'], ['state', 'district']),
+    'map_insurance': (['insurance_count', 'insurance_amount'], ['state', 'district']),
+    'top_transaction': (['count', 'amount'], ['district', 'pincode']),
+    'top_user': (['registeredusers'], ['district', 'pincode']),
+    'top_insurance': (['count', 'amount'], ['district', 'pincode']),
+}
+
+COLUMNS = ['source', 'metric', 'grain', 'scope', 'year', 'quarter', 'state', 'district', 'pincode', 'value', 'rank']
+
+BOARD = ['metric', 'scope', 'year', 'quarter']
+
+
+# Per-quarter sums of a source's measures at one grain
+def source_sql(source, grain):
+    measures, _ = SOURCES[source]
+    keys, where = GRAINS[grain]
+    cols = keys + ['year', 'quarter'] + [f"SUM({m}) AS {m}" for m in measures]
+    return (f"SELECT {', '.join(cols)} FROM {source} {'WHERE ' + where if where else ''} "
+            f"GROUP BY {', '.join(keys + ['year', 'quarter'])}")
+
+
+# Boards of one source and grain from its per-quarter sums: every quarter, year and all years,
+# country-wide and (below state grain) per state
+def build(source, grain, values):
+    keys, _ = GRAINS[grain]
+    values = values.dropna(subset=['year', 'quarter'])
+    long = values.melt(id_vars=keys + ['year', 'quarter'], var_name='metric', value_name='value')
+    long['value'] = pd.to_numeric(long['value'], errors='coerce')
+    long = long.dropna(subset=['value'])
+    yearly = long.groupby(['metric'] + keys + ['year'], observed=True)['value'].sum().reset_index()
+    overall = long.groupby(['metric'] + keys, observed=True)['value'].sum().reset_index()
+    boards = pd.concat([long, yearly.assign(quarter=0), overall.assign(year=0, quarter=0)], ignore_index=True)
+    boards['year'] = boards['year'].astype('int64')
+    boards['quarter'] = boards['quarter'].astype('int64')
+
+    scoped = [boards.assign(scope=INDIA)]
+    if grain != 'state':
+        scoped.append(boards.assign(scope=boards['state']))
+    df = pd.concat(scoped, ignore_index=True)
+    df['rank'] = df.groupby(BOARD)['value'].rank(method='dense', ascending=False).astype('int64')
+    df['source'] = source
+    df['grain'] = grain
+    for col in COLUMNS:
+        if col not in df:
+            df[col] = None
+    return df[COLUMNS].sort_values(BOARD + ['rank'], kind='stable', ignore_index=True)
+
+
+def _boards(con, source):
+    frames = [build(source, grain, pd.read_sql(source_sql(source, grain), con)) for grain in SOURCES[source][1]]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Rebuild the leaderboards after an ingest.
+# sources: fact tables that changed (default: all); partitions: {fact table: partitions} from an
+# incremental ingest. A changed quarter moves ranks across its year's and the all-years boards,
+# so the boards of a changed source are rebuilt whole.
+def refresh(engine, sources=None, partitions=None):
+    start = perf.clock()
+    existing = set(inspect(engine).get_table_names())
+    sources = sorted(set(partitions or sources or SOURCES) & set(SOURCES) & existing)
+    if not sources:
+        return None
+
+    if RANKING not in existing or set(sources) == set(SOURCES) & existing:
+        frames = [_boards(engine, source) for source in sources]
+        df = pd.concat(frames, ignore_index=True)
+        loader.replace_table(engine, RANKING, df)
+        log.info("Rebuilt %s: %d rows", RANKING, len(df))
+    else:
+        frames = []
+        with engine.begin() as conn:
+            for source in sources:
+                df = _boards(conn, source)
+                conn.execute(text(f"DELETE FROM {RANKING} WHERE source = :source"), {'source': source})
+                loader.copy_rows(conn, RANKING, df)
+                frames.append(df)
+        df = pd.concat(frames, ignore_index=True)
+        log.info("Updated %s: %s, %d rows", RANKING, ', '.join(sources), len(df))
+    perf.record('ranking', RANKING, start, df)
+    return df
+
+
+def _where(source, metric, grain, state, year, quarter):
+    params = {'source': source, 'metric': metric, 'grain': grain, 'scope': state or INDIA,
+              'year': int(year or 0), 'quarter': int(quarter or 0)}
+    return ("source = :source AND metric = :metric AND grain = :grain AND scope = :scope "
+            "AND year = :year AND quarter = :quarter"), params
+
+
+# Top (or bottom) k entries of a board, best first (worst first for bottom=True).
+# state: rank within that state only; year / quarter: that period (default: all years)
+def top(con, source, metric, grain='district', k=10, state=None, year=None, quarter=None, bottom=False):
+    where, params = _where(source, metric, grain, state, year, quarter)
+    cols = ', '.join(GRAINS[grain][0] + ['value', 'rank'])
+    sql = f"SELECT {cols} FROM {RANKING} WHERE {where} ORDER BY rank {'DESC' if bottom else ''} LIMIT {int(k)}"
+    return pd.read_sql(text(sql), con, params=params)
+
+
+def bottom(con, source, metric, grain='district', k=10, state=None, year=None, quarter=None):
+    return top(con, source, metric, grain, k, state, year, quarter, bottom=True)
+
+
+# Rank of one state / district / pincode on a board, with the board's last rank (`of`).
+# scope: rank among that state's entries instead of the whole country
+def rank_of(con, source, metric, grain, name, scope=None, year=None, quarter=None):
+    where, params = _where(source, metric, grain, scope, year, quarter)
+    column = GRAINS[grain][0][-1]
+    cols = ', '.join(GRAINS[grain][0] + ['value', 'rank'])
+    df = pd.read_sql(text(f"SELECT {cols} FROM {RANKING} WHERE {where} AND {column} = :name"), con,
+                     params={**params, 'name': name})
+    last = pd.read_sql(text(f"SELECT MAX(rank) AS of FROM {RANKING} WHERE {where}"), con, params=params)
+    df['of'] = last['of'].iloc[0]
+    return df
@@ -0,0 +1,74 @@
+# Pre-aggregated rollup tables for the Business Case Study charts
+from sqlalchemy import inspect, text
+import loader
+import schema
+
+
+# Rollup name: (source fact table, group-by dimensions, summed measures).
+# Grains: _sq = state x year x quarter, _dy = district x year.
+# Every rollup also stores n_rows (COUNT(*)) so AVG() over the raw rows = SUM(measure) / SUM(n_rows).
+ROLLUPS = {
+    'rollup_aggregated_transaction_sq': ('aggregated_transaction', ['state', 'year', 'quarter', 'type_payments'],
+                                         ['transaction_count', 'transaction_amount']),
+    'rollup_aggregated_user_sq': ('aggregated_user', ['state', 'year', 'quarter', 'brand'],
+                                  ['registeredusers', 'appopens', 'count']),
+    'rollup_aggregated_insurance_sq': ('aggregated_insurance', ['state', 'year', 'quarter'], ['count', 'amount']),
+    'rollup_map_transaction_sq': ('map_transaction', ['state', 'year', 'quarter'],
+                                  ['transaction_count', 'transaction_amount']),
+    'rollup_map_transaction_dy': ('map_transaction', ['state', 'district', 'year'],
+                                  ['transaction_count', 'transaction_amount']),
+    'rollup_map_user_sq': ('map_user', ['state', 'year', 'quarter'], ['registered_users', 'app_opens']),
+    'rollup_top_insurance_sq': ('top_insurance', ['state', 'year', 'quarter'], ['count', 'amount']),
+    'rollup_top_insurance_dy': ('top_insurance', ['state', 'district', 'year'], ['count', 'amount']),
+}
+
+# Rollups no chart reads any more (the top-N charts read ranking.py's leaderboards); dropped on refresh
+RETIRED = ['rollup_map_user_dy', 'rollup_top_insurance_py', 'rollup_top_transaction_py', 'rollup_top_user_py']
+
+
+# Indexes of a rollup as (index name, columns, included columns): its (state, year[, quarter]) slices,
+# which an incremental refresh replaces, and every chart grouping (query_plan.GROUPINGS) the slice index
+# does not lead with, so each GROUP BY reads an index in order. All other columns are included.
+def indexes(name):
+    import query_plan
+    _, dims, measures = ROLLUPS[name]
+    keys = [[c for c in ('state', 'year', 'quarter') if c in dims]]
+    for by in query_plan.GROUPINGS.get(name, []):
+        if not any(key[:len(by)] == list(by) for key in keys):
+            keys.append(list(by))
+    columns = dims + measures + ['n_rows']
+    return [(f"ix_{name}_{'_'.join(key)}", key, [c for c in columns if c not in key]) for key in keys]
+
+
+# SELECT that builds one rollup (optionally restricted with a WHERE clause)
+def rollup_sql(name, where=''):
+    source, dims, measures = ROLLUPS[name]
+    cols = dims + [f"SUM({m}) AS {m}" for m in measures] + ['COUNT(*) AS n_rows']
+    return f"SELECT {', '.join(cols)} FROM {source} {where} GROUP BY {', '.join(dims)}"
+
+
+# Refresh rollups after an ingest.
+# sources: fact tables that changed (default: all).
+# partitions: optional {fact table: {(state, year, quarter), ...}} from an incremental ingest -
+#   only the affected (state, year) slices of each rollup are recomputed.
+def refresh(engine, sources=None, partitions=None):
+    sources = set(partitions or sources or {r[0] for r in ROLLUPS.values()})
+    existing = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for name in set(RETIRED) & existing:
+            conn.execute(text(f"DROP TABLE {name}"))
+    for name, (source, dims, measures) in ROLLUPS.items():
+        if source not in sources or source not in existing:
+            continue
+        if partitions is None or name not in existing:
+            loader.replace_table_query(engine, name, rollup_sql(name))
+            with engine.begin() as conn:
+                schema.create_indexes(conn, name)
+            continue
+        slices = sorted({(s, y) for s, y, q in partitions[source]})
+        with engine.begin() as conn:
+            for state, year in slices:
+                params = {'state': state, 'year': year}
+                conn.execute(text(f"DELETE FROM {name} WHERE state = :state AND year = :year"), params)
+                conn.execute(text(f"INSERT INTO {name} "
+                                  + rollup_sql(name, 'WHERE state = :state AND year = :year')), params)
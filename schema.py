@@ -0,0 +1,243 @@
+# Typed schema (DDL), migrations and index checks for the PhonePe tables
+import argparse
+import os
+import pandas as pd
+from sqlalchemy import (BigInteger, Column, Float, Index, Integer, MetaData, Numeric, SmallInteger,
+                        Table, Text, create_engine, inspect, text)
+
+
+metadata = MetaData()
+
+
+def _facts(name, *columns):
+    return Table(name, metadata, *columns)
+
+
+# Column types: smallint year/quarter, bigint counts, numeric amounts, low-cardinality text
+# dimensions (state, district, brand ...) that pandas reads back as categoricals.
+TABLES = {t.name: t for t in [
+    _facts('map_transaction',
+           Column('state', Text), Column('district', Text), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('transaction_count', BigInteger), Column('transaction_amount', Numeric(20, 2))),
+    _facts('map_insurance',
+           Column('state', Text), Column('district', Text), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('insurance_count', BigInteger), Column('insurance_amount', Numeric(20, 2))),
+    _facts('map_country_insurance',
+           Column('state', Text), Column('district', Text), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('metric', Float), Column('latitude', Float), Column('longitude', Float)),
+    _facts('map_user',
+           Column('state', Text), Column('district', Text), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('registered_users', BigInteger), Column('app_opens', BigInteger)),
+    _facts('aggregated_transaction',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger), Column('type_payments', Text),
+           Column('transaction_count', BigInteger), Column('transaction_amount', Numeric(20, 2))),
+    _facts('aggregated_user',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('registeredusers', BigInteger), Column('appopens', BigInteger), Column('brand', Text),
+           Column('count', BigInteger), Column('percentage', Float)),
+    _facts('aggregated_insurance',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger), Column('type', Text),
+           Column('count', BigInteger), Column('amount', Numeric(20, 2))),
+    _facts('top_transaction',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger), Column('district', Text),
+           Column('type', Text), Column('count', BigInteger), Column('amount', Numeric(20, 2)), Column('pincode', Integer)),
+    _facts('top_user',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger), Column('district', Text),
+           Column('type', Text), Column('registeredusers', BigInteger), Column('pincode', Integer)),
+    _facts('top_insurance',
+           Column('state', Text), Column('year', SmallInteger), Column('quarter', SmallInteger), Column('district', Text),
+           Column('type', Text), Column('count', BigInteger), Column('amount', Numeric(20, 2)), Column('pincode', Integer)),
+    # Derived at ingest by map_merge.py: one geocoded row per (state, district, year, quarter)
+    _facts('map_merge',
+           Column('state', Text), Column('district', Text), Column('latitude', Float), Column('longitude', Float),
+           Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('registered_users', BigInteger), Column('app_opens', BigInteger),
+           Column('transaction_count', BigInteger), Column('transaction_amount', Numeric(20, 2)),
+           Column('insurance_count', BigInteger), Column('insurance_amount', Numeric(20, 2))),
+    # Derived at ingest by growth.py: one row per (metric, grain, series, year, quarter), quarter 0 = the year
+    _facts('growth',
+           Column('metric', Text), Column('grain', Text), Column('state', Text), Column('district', Text),
+           Column('pincode', Integer), Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('value', Float), Column('previous', Float), Column('delta', Float), Column('pct', Float),
+           Column('cagr', Float)),
+    # Derived at ingest by ranking.py: leaderboards with dense ranks, one row per (board, entry)
+    _facts('ranking',
+           Column('source', Text), Column('metric', Text), Column('grain', Text), Column('scope', Text),
+           Column('year', SmallInteger), Column('quarter', SmallInteger),
+           Column('state', Text), Column('district', Text), Column('pincode', Integer),
+           Column('value', Float), Column('rank', Integer)),
+]}
+
+# pandas dtypes matching the SQL types (nullable ints so NULLs survive COPY)
+DTYPES = {SmallInteger: 'Int16', Integer: 'Int32', BigInteger: 'Int64', Numeric: 'float64', Float: 'float64', Text: 'object'}
+
+DIMENSIONS = ['state', 'district', 'year', 'quarter', 'type_payments', 'brand', 'type', 'pincode']
+
+
+# Indexes of the derived lookup tables, replacing the fact table ones:
+#   growth - years of a metric & grain, and the per-state series replaced by an incremental ingest
+#   ranking - a board in rank order (top / bottom K), and one entry's ranks (rank of X)
+LOOKUP_INDEXES = {
+    'growth': [('ix_growth_metric_grain_year_quarter', ['metric', 'grain', 'year', 'quarter'],
+                ['state', 'district', 'pincode', 'value', 'previous', 'delta', 'pct', 'cagr']),
+               ('ix_growth_state_grain_metric', ['state', 'grain', 'metric'], [])],
+    'ranking': [('ix_ranking_board_rank', ['source', 'metric', 'grain', 'scope', 'year', 'quarter', 'rank'],
+                 ['state', 'district', 'pincode', 'value']),
+                ('ix_ranking_entry', ['source', 'metric', 'grain', 'state', 'district', 'pincode'], [])],
+}
+
+
+# Composite (state, year, quarter) and (district) indexes for every fact table,
+# as (index name, columns, included columns).
+# On PostgreSQL the measure columns are INCLUDEd so GROUP BY queries can use index-only scans.
+def indexes(name):
+    import rollups
+    if name in LOOKUP_INDEXES:
+        return LOOKUP_INDEXES[name]
+    if name in rollups.ROLLUPS:
+        return rollups.indexes(name)
+    cols = [c.name for c in TABLES[name].c]
+    measures = [c for c in cols if c not in DIMENSIONS]
+    result = [(f"ix_{name}_state_year_quarter", ['state', 'year', 'quarter'], measures)]
+    if 'district' in cols:
+        result.append((f"ix_{name}_district", ['district'], ['year'] + measures))
+    return result
+
+
+# Cast a DataFrame to the declared column types before it is loaded
+def coerce(name, df):
+    table = TABLES.get(name)
+    if table is None:
+        return df
+    df = df.copy()
+    for col in table.c:
+        if col.name not in df:
+            continue
+        dtype = DTYPES[type(col.type)]
+        if dtype.startswith('Int'):
+            df[col.name] = pd.to_numeric(df[col.name], errors='coerce').round().astype(dtype)
+        elif dtype == 'float64':
+            df[col.name] = pd.to_numeric(df[col.name], errors='coerce')
+    return df[[c.name for c in table.c if c.name in df]]
+
+
+# Create an empty typed table `target` with the columns of schema table `name`
+def create_table(conn, name, target=None):
+    table = TABLES[name].to_metadata(MetaData(), name=target or name)
+    table.create(conn, checkfirst=True)
+    return table
+
+
+# Create the declared indexes on `target` (a copy of schema table or rollup `name`), suffixing index names.
+# SQLite has no INCLUDE: the included columns are appended to the key, so the index still covers the query.
+def create_indexes(conn, name, target=None, suffix=''):
+    table = Table(target or name, MetaData(), autoload_with=conn)
+    for ix_name, cols, include in indexes(name):
+        if conn.dialect.name != 'postgresql':
+            cols, include = cols + include, []
+        Index(ix_name + suffix, *[table.c[c] for c in cols], postgresql_include=include).create(conn, checkfirst=True)
+
+
+# Bring existing tables (e.g. written by DataFrame.to_sql) to the typed schema, add indexes
+# and (re)build map_merge (the notebook's version is untyped and not geocoded), growth and ranking
+def migrate(engine):
+    import growth
+    import loader
+    import map_merge
+    import ranking
+    insp = inspect(engine)
+    for name, table in TABLES.items():
+        if name in (map_merge.MAP_MERGE, growth.GROWTH, ranking.RANKING):
+            continue                    # Rebuilt from the fact tables below
+        if not insp.has_table(name):
+            with engine.begin() as conn:
+                create_table(conn, name)
+                create_indexes(conn, name)
+            continue
+        current = {c['name']: c['type'].compile(dialect=engine.dialect) for c in insp.get_columns(name)}
+        typed = all(current.get(c.name) == c.type.compile(dialect=engine.dialect) for c in table.c)
+        if engine.dialect.name == 'postgresql' and not typed:
+            with engine.begin() as conn:
+                for c in table.c:
+                    ddl = c.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {name} ALTER COLUMN "{c.name}" TYPE {ddl} USING "{c.name}"::{ddl}'))
+        elif not typed:
+            loader.replace_table(engine, name, pd.read_sql(f"SELECT * FROM {name}", engine))
+        with engine.begin() as conn:
+            create_indexes(conn, name)
+            if engine.dialect.name == 'postgresql':
+                conn.execute(text(f"ANALYZE {name}"))
+    map_merge.refresh(engine)
+    growth.refresh(engine)
+    ranking.refresh(engine)
+
+
+# Declared indexes missing from the tables in the database, as (table, index name) pairs
+def missing_indexes(engine):
+    import rollups
+    insp = inspect(engine)
+    missing = []
+    for name in list(TABLES) + list(rollups.ROLLUPS):
+        if not insp.has_table(name):
+            continue
+        present = {ix['name'] for ix in insp.get_indexes(name)}
+        missing.extend((name, ix_name) for ix_name, _, _ in indexes(name) if ix_name not in present)
+    return missing
+
+
+# Walk a PostgreSQL EXPLAIN (FORMAT JSON) plan and collect (relation, node type, index)
+def _plan_scans(node):
+    scans = []
+    if 'Relation Name' in node:
+        scans.append((node['Relation Name'], node['Node Type'], node.get('Index Name')))
+    for child in node.get('Plans', []):
+        scans.extend(_plan_scans(child))
+    return scans
+
+
+# Report how each dashboard query reads its tables: one row per (query, table) with
+# access = 'index' or 'seq'. Works on PostgreSQL (EXPLAIN) and SQLite (EXPLAIN QUERY PLAN).
+def check_queries(engine, queries=None):
+    from queries import PARAMS
+    if queries is None:
+        from queries import QUERIES as queries
+    rows = []
+    tables = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            # Small tables are always read sequentially; ask whether an index can serve each query
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for qname, sql in queries.items():
+            if engine.dialect.name == 'postgresql':
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), PARAMS.get(qname, {})).scalar()
+                for relation, node, index in _plan_scans(plan[0]['Plan']):
+                    rows.append({'query': qname, 'table': relation,
+                                 'access': 'index' if index or 'Index' in node else 'seq', 'detail': node})
+            else:
+                for *_, detail in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), PARAMS.get(qname, {})):
+                    if detail.startswith(('SCAN', 'SEARCH')) and detail.split()[1] in tables:
+                        rows.append({'query': qname, 'table': detail.split()[1],
+                                     'access': 'index' if 'INDEX' in detail else 'seq', 'detail': detail})
+    return pd.DataFrame(rows, columns=['query', 'table', 'access', 'detail'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate the PhonePe tables to the typed schema / check index usage")
+    parser.add_argument('command', choices=['migrate', 'check'])
+    parser.add_argument('--db', default=os.environ.get('PHONEPE_DB_URL'), required='PHONEPE_DB_URL' not in os.environ,
+                        help="SQLAlchemy database URL (default: $PHONEPE_DB_URL)")
+    args = parser.parse_args()
+    engine = create_engine(args.db)
+    if args.command == 'migrate':
+        migrate(engine)
+    else:
+        report = check_queries(engine)
+        print(report.to_string(index=False))
+        seq = report[report['access'] == 'seq']
+        print(f"\n{report['query'].nunique()} queries checked, {seq['query'].nunique()} with sequential scans")
+        missing = missing_indexes(engine)
+        for table, ix_name in missing:
+            print(f"missing index {ix_name} on {table}")
+        import rollups
+        scanned = seq[seq['table'].isin(list(TABLES) + list(rollups.ROLLUPS))]
+        raise SystemExit(1 if missing or len(scanned) else 0)
@@ -0,0 +1,175 @@
+# Versioned Parquet snapshot of the curated tables, the rollups and the merged map frame.
+# Layout: <root>/v<version>/<table>/year=<y>/quarter=<q>/*.parquet, <root>/v<version>/catalog.json
+# and <root>/CURRENT (the version readers should use). The dashboard reads it memory-mapped,
+# so it can start (and run read-only replicas) without a database connection.
+import json
+import logging
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+from sqlalchemy import BigInteger, Float, Integer, Numeric, SmallInteger, Text, inspect
+import manifest
+import perf
+import rollups
+import schema
+
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_ROOT = os.environ.get('PHONEPE_SNAPSHOT', 'snapshot')
+
+# Merged map frame (map_user + map_transaction + map_insurance + coordinates, see map_merge.py)
+MAP_FRAME = 'map_merge'
+
+# Partition columns (only those a table has are used)
+PARTITIONS = {'year': pa.int16(), 'quarter': pa.int16()}
+
+# Snapshot versions kept on disk (readers of the previous one keep working during a switch)
+KEEP_VERSIONS = 2
+
+# Column types of the views over empty tables (NUMERIC is read back from Parquet as float64)
+DUCKDB_TYPES = {SmallInteger: 'SMALLINT', Integer: 'INTEGER', BigInteger: 'BIGINT', Numeric: 'DOUBLE',
+                Float: 'DOUBLE', Text: 'VARCHAR'}
+
+_filesystem = fs.LocalFileSystem(use_mmap=True)
+_catalogs = {}
+
+
+def _partitioning(columns):
+    fields = [(c, t) for c, t in PARTITIONS.items() if c in columns]
+    return ds.partitioning(pa.schema(fields), flavor='hive') if fields else None
+
+
+# Arrow-friendly frame: NUMERIC columns read back as Decimal become float64
+def _plain(df):
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            first = df[col].dropna().head(1)
+            if len(first) and not isinstance(first.iloc[0], str):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _write_table(df, path):
+    if df.empty:
+        return                      # Recorded in the catalog only
+    table = pa.Table.from_pandas(_plain(df), preserve_index=False)
+    ds.write_dataset(table, path, format='parquet', partitioning=_partitioning(df.columns),
+                     existing_data_behavior='delete_matching')
+
+
+# Write a snapshot of every curated table & rollup in the database (always including the map frame),
+# then point CURRENT at it. Returns the snapshot directory.
+def write(engine, root=SNAPSHOT_ROOT, version=None):
+    import data_access                     # data_access reads snapshots too
+
+    version = manifest.read_version(engine) if version is None else version
+    target = os.path.join(root, f'v{version}')
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+
+    existing = set(inspect(engine).get_table_names())
+    tables = {}
+    for name in list(schema.TABLES) + list(rollups.ROLLUPS):
+        if name == MAP_FRAME:
+            df = data_access.map_frame(engine)
+        elif name in existing:
+            df = pd.read_sql(f"SELECT * FROM {name}", engine)
+        else:
+            continue
+        _write_table(df, os.path.join(staging, name))
+        tables[name] = {'columns': list(df.columns), 'rows': len(df)}
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, 'catalog.json'), 'w') as f:
+        json.dump({'version': version, 'tables': tables}, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+
+    # Switch readers over (atomic rename), then drop old versions
+    pointer = os.path.join(root, 'CURRENT')
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(str(version))
+    os.replace(pointer + '.tmp', pointer)
+    versions = sorted(int(d[1:]) for d in os.listdir(root) if d[:1] == 'v' and d[1:].isdigit())
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != version:
+            shutil.rmtree(os.path.join(root, f'v{old}'), ignore_errors=True)
+
+    log.info("snapshot v%s written to %s (%d tables)", version, target, len(tables))
+    return target
+
+
+# Directory of the current snapshot, or None if there is none yet
+def current(root=SNAPSHOT_ROOT):
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            path = os.path.join(root, f'v{int(f.read().strip())}')
+    except (OSError, ValueError):
+        return None
+    return path if os.path.isdir(path) else None
+
+
+def catalog(path):
+    if path not in _catalogs:
+        with open(os.path.join(path, 'catalog.json')) as f:
+            _catalogs[path] = json.load(f)
+    return _catalogs[path]
+
+
+def version(path):
+    return catalog(path)['version']
+
+
+# Read one table from a snapshot (memory-mapped).
+# filters: {column: [values] or None}; year/quarter filters prune partitions, columns a table
+# does not have are ignored.
+def read(path, name, columns=None, filters=None):
+    info = catalog(path)['tables'][name]
+    table_columns = info['columns']
+    if not info['rows']:
+        return pd.DataFrame(columns=list(columns or table_columns))
+    start = perf.clock()
+    dataset = ds.dataset(os.path.join(path, name), format='parquet', filesystem=_filesystem,
+                         partitioning=_partitioning(table_columns))
+    condition = None
+    for col, values in (filters or {}).items():
+        if values is None or col not in table_columns:
+            continue
+        values = pa.array([v.item() if hasattr(v, 'item') else v for v in values],
+                          type=dataset.schema.field(col).type)
+        expr = ds.field(col).isin(values)
+        condition = expr if condition is None else condition & expr
+    df = dataset.to_table(columns=list(columns or table_columns), filter=condition).to_pandas()
+    perf.record('read_parquet', name, start, df)
+    return df
+
+
+# Columns of a table without rows, typed from the schema (a rollup takes its source table's types, n_rows is a count)
+def _empty_select(name, columns):
+    table = schema.TABLES.get(name if name in schema.TABLES else rollups.ROLLUPS.get(name, (None,))[0])
+    cols = [f"CAST(NULL AS {DUCKDB_TYPES[type(table.c[c].type)]}) AS {c}" if table is not None and c in table.c
+            else f"CAST(NULL AS BIGINT) AS {c}" for c in columns]
+    return f"SELECT {', '.join(cols)} WHERE false"
+
+
+# Native duckdb connection with one view per snapshot table, so the chart SQL (queries.py)
+# runs without a database; tables without rows are empty views. Requires the optional duckdb package.
+def connect(path):
+    import duckdb
+
+    con = duckdb.connect()
+    for name, info in catalog(path)['tables'].items():
+        if not info['rows']:
+            con.execute(f"CREATE VIEW {name} AS {_empty_select(name, info['columns'])}")
+            continue
+        files = os.path.join(path, name, '**', '*.parquet').replace("'", "''")
+        cols = ', '.join(info['columns'])
+        con.execute(f"CREATE VIEW {name} AS SELECT {cols} "
+                    f"FROM read_parquet('{files}', hive_partitioning = true)")
+    con.execute(f"CREATE VIEW {manifest.VERSION_TABLE} AS SELECT {int(version(path))} AS version")
+    return con
@@ -0,0 +1,165 @@
+# Server-side table browser for the DATA tab: keyset-paginated pages of a table with column
+# selection, sorting and the sidebar filters pushed into SQL, and exports streamed batch by batch.
+# Runs on a SQLAlchemy engine or on the snapshot's duckdb connection (snapshot.connect()), so a page
+# costs one indexed query of PAGE_SIZE rows however large the table is.
+#   python table_browser.py export top_user top_user.parquet --state karnataka --year 2024
+#   python table_browser.py check        # every table pages through all of its rows
+import argparse
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Float, Integer, Numeric, SmallInteger, Text, create_engine, inspect
+import data_access
+import perf
+import query_service
+import schema
+
+
+PAGE_SIZE = 1000
+
+# Rows fetched per round trip when exporting
+EXPORT_BATCH = 50_000
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+ARROW_TYPES = {SmallInteger: pa.int16(), Integer: pa.int32(), BigInteger: pa.int64(), Numeric: pa.float64(),
+               Float: pa.float64(), Text: pa.string()}
+
+
+# Partition columns: set on every row by the ingest, in (state, year, quarter) index order
+PARTITION = ['state', 'year', 'quarter']
+
+# Columns that identify a row beyond the dimension columns: the series of growth, the board of
+# ranking and the point of map_country_insurance. Rows sharing a key would be skipped by the cursor.
+ROW_KEYS = {
+    'growth': ['metric', 'grain'],
+    'ranking': ['source', 'metric', 'grain', 'scope'],
+    'map_country_insurance': ['latitude', 'longitude'],
+}
+
+
+def columns(table):
+    return [c.name for c in schema.TABLES[table].c]
+
+
+# Row order within equal sort values: the dimension and ROW_KEYS columns (together they identify a row),
+# partition columns first so the (state, year, quarter) index serves the default order
+def key_columns(table):
+    return PARTITION + [c for c in columns(table) if c in schema.DIMENSIONS and c not in PARTITION] + \
+        ROW_KEYS.get(table, [])
+
+
+# Sort / keyset expression of a column: NULLs compare as '' (text) or -1 (numbers)
+def _key(table, col):
+    if col in PARTITION:
+        return col
+    default = "''" if type(schema.TABLES[table].c[col].type) is Text else '-1'
+    return f"COALESCE({col}, {default})"
+
+
+# WHERE clause of the sidebar filters (data_access.where_clause) plus the keyset predicate:
+# rows after the cursor `after` in `order`. Returns (sql, params, expanding bind parameters).
+def _where(table, filters, after=None, order=(), descending=False):
+    extra, keyset = [], {}
+    if after is not None:
+        names = [f'after_{i}' for i in range(len(order))]
+        extra.append(f"({', '.join(order)}) {'<' if descending else '>'} ({', '.join(':' + n for n in names)})")
+        keyset = dict(zip(names, after))
+    where, params, binds = data_access.where_clause(filters, data_access.TABLE_COLUMNS.get(table, data_access.FILTERS),
+                                                    extra)
+    return where, {**params, **keyset}, binds
+
+
+# Row count of a table for the selected filters
+def count(con, table, filters=None):
+    where, params, binds = _where(table, filters)
+    return int(query_service.read(con, f"SELECT COUNT(*) AS n FROM {table}{where}", params, binds)['n'].iloc[0])
+
+
+# One page of `table`: the rows after the keyset cursor `after` (None = first page) in `sort` order.
+# Returns (page, cursor of the next page or None on the last page).
+def page(con, table, select=None, sort=None, descending=False, filters=None, after=None, size=PAGE_SIZE):
+    select = list(select or columns(table))
+    sort = sort or key_columns(table)[0]
+    order = [_key(table, c) for c in [sort] + [k for k in key_columns(table) if k != sort]]
+    where, params, binds = _where(table, filters, after, order, descending)
+    keys = [f"{expr} AS _key{i}" for i, expr in enumerate(order)]
+    direction = ' DESC' if descending else ''
+    sql = (f"SELECT {', '.join(select + keys)} FROM {table}{where} "
+           f"ORDER BY {', '.join(expr + direction for expr in order)} LIMIT {int(size) + 1}")
+    start = perf.clock()
+    df = query_service.read(con, sql, params, binds)
+    perf.record('page', table, start, df)
+    more = len(df) > size
+    df = df.head(size)
+    cursor = tuple(v.item() if hasattr(v, 'item') else v for v in df.iloc[-1][[f'_key{i}' for i in range(len(order))]]) \
+        if more else None
+    return df[select].reset_index(drop=True), cursor
+
+
+# Every page of a selection, EXPORT_BATCH rows at a time
+def batches(con, table, select=None, sort=None, descending=False, filters=None, size=EXPORT_BATCH):
+    after = None
+    while True:
+        df, after = page(con, table, select, sort, descending, filters, after, size)
+        if len(df):
+            yield df
+        if after is None:
+            return
+
+
+# Stream a selection into a binary file as CSV or Parquet (one row group per batch); returns the rows written
+def export(con, table, out, fmt='csv', select=None, sort=None, descending=False, filters=None, size=EXPORT_BATCH):
+    select = list(select or columns(table))
+    arrow = pa.schema([(c, ARROW_TYPES[type(schema.TABLES[table].c[c].type)]) for c in select])
+    writer = pq.ParquetWriter(out, arrow) if fmt == 'parquet' else None
+    rows = 0
+    for df in batches(con, table, select, sort, descending, filters, size):
+        df = schema.coerce(table, df)[select]
+        if writer is None:
+            out.write(df.to_csv(index=False, header=rows == 0).encode())
+        else:
+            writer.write_table(pa.Table.from_pandas(df, schema=arrow, preserve_index=False))
+        rows += len(df)
+    if writer is not None:
+        writer.close()
+    elif rows == 0:
+        out.write((','.join(select) + '\n').encode())
+    return rows
+
+
+# Page through every table of the schema in the database, `size` rows a page; returns
+# {table: (rows paged, COUNT(*))} - the two differ when rows share a key and the cursor skips some
+def check(engine, size=PAGE_SIZE):
+    tables = [t for t in schema.TABLES if inspect(engine).has_table(t)]
+    return {t: (sum(len(df) for df in batches(engine, t, size=size)), count(engine, t)) for t in tables}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export a PhonePe table (optionally filtered) as CSV or Parquet")
+    parser.add_argument('command', choices=['export', 'check'])
+    parser.add_argument('table', nargs='?', choices=list(schema.TABLES))
+    parser.add_argument('out', nargs='?', help="output file (.csv or .parquet)")
+    parser.add_argument('--db', default=os.environ.get('PHONEPE_DB_URL'), required='PHONEPE_DB_URL' not in os.environ,
+                        help="SQLAlchemy database URL (default: $PHONEPE_DB_URL)")
+    parser.add_argument('--columns', nargs='+', help="columns to export (default: all)")
+    parser.add_argument('--sort', help="sort column (default: the first key column)")
+    parser.add_argument('--descending', action='store_true')
+    for col in data_access.FILTERS:
+        parser.add_argument(f'--{col}', nargs='+', type=str if col in ('state', 'district') else int)
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        results = check(create_engine(args.db))
+        for table, (paged, counted) in results.items():
+            print(f"{table:<36} {paged:>10} of {counted:>10} rows{'' if paged == counted else '  MISSING ROWS'}")
+        missing = [t for t, (paged, counted) in results.items() if paged != counted]
+        print(f"\n{len(results)} tables checked, {len(missing)} with missing rows")
+        raise SystemExit(1 if missing else 0)
+    if not args.out:
+        parser.error("export needs a table and an output file")
+    fmt = 'parquet' if args.out.endswith('.parquet') else 'csv'
+    filters = {col: getattr(args, col) for col in data_access.FILTERS if getattr(args, col)}
+    with open(args.out, 'wb') as f:
+        n = export(create_engine(args.db), args.table, f, fmt, args.columns, args.sort, args.descending, filters)
+    print(f"{n} rows written to {args.out}")